@@ -0,0 +1,84 @@
+#!/usr/bin/env python
+"""
+Benchmark sequential and parallel parsing of a large generated bibtex file.
+"""
+
+import argparse
+import os
+import pickle
+import random
+import time
+
+import bibtex_dblp.database
+
+
+def generate_bibtex(no_entries, seed=42):
+    """
+    Generate bibtex string with the given number of entries.
+    :param no_entries: Number of entries.
+    :param seed: Seed for the random generator.
+    :return: Bibtex string.
+    """
+    rand = random.Random(seed)
+    words = ["model", "checking", "probabilistic", "search", "efficient", "parallel", "analysis", "verification", "systems", "learning", "graphs", "data"]
+    names = ["Alice Smith", "Bob van der Berg", "Carol Jones", 'Dan M{\\"u}ller', "Jones, Jr., Eve", "Frank de Vries", "Grace Hopper"]
+    venues = ["TACAS", "CAV", "SPIRE", "SIGIR", "CIKM", "VLDB"]
+    commands = ["@string{{venue{} = {{{}}}}}\n".format(i, venue) for i, venue in enumerate(venues)]
+    for i in range(no_entries):
+        authors = " and ".join(rand.sample(names, rand.randint(1, 4)))
+        title = " ".join(rand.choice(words) for _ in range(rand.randint(3, 10))).capitalize()
+        if i % 2 == 0:
+            venue = "  booktitle    = venue{},\n".format(rand.randrange(len(venues)))
+            entry_type = "inproceedings"
+        else:
+            venue = "  journal      = {{Journal of {}}},\n  volume       = {{{}}},\n".format(rand.choice(words).capitalize(), rand.randint(1, 50))
+            entry_type = "article"
+        commands.append(
+            "@{}{{key{},\n  author       = {{{}}},\n  title        = {{{{{}}}}},\n{}  pages        = {{{}--{}}},\n  year         = {{{}}},\n  doi          = {{10.1000/{}}}\n}}\n".format(
+                entry_type, i, authors, title, venue, i % 100, i % 100 + 15, rand.randint(1990, 2024), i
+            )
+        )
+    return "\n".join(commands)
+
+
+def measure(function, *args, repeat=1, **kwargs):
+    """
+    Measure the minimal wall time of a function call.
+    :return: Minimal time in seconds, result of the last call.
+    """
+    best = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = function(*args, **kwargs)
+        duration = time.perf_counter() - start
+        best = duration if best is None else min(best, duration)
+    return best, result
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark sequential and parallel parsing of a generated bibtex file.")
+    parser.add_argument("--entries", "-n", help="Number of generated entries.", type=int, default=100000)
+    parser.add_argument("--processes", "-j", help="Numbers of processes to benchmark.", type=int, nargs="+", default=[2, 4, 8])
+    parser.add_argument("--repeat", "-r", help="Number of repetitions. The minimal time is reported.", type=int, default=1)
+    args = parser.parse_args()
+
+    text = generate_bibtex(args.entries)
+    print("Entries: {}, size: {:.1f} MB, CPUs: {}".format(args.entries, len(text) / 1e6, os.cpu_count()))
+
+    sequential, bib = measure(bibtex_dblp.database.parse_bibtex, text, repeat=args.repeat)
+    print("{:>12}: {:8.2f}s".format("sequential", sequential))
+
+    # The entries parsed by the workers are pickled and unpickled in the main process.
+    # This part is not parallelized and bounds the possible speedup.
+    entries = list(bib.entries.items())
+    transfer, _ = measure(lambda: pickle.loads(pickle.dumps(entries)), repeat=args.repeat)
+    print("{:>12}: {:8.2f}s (speedup at most {:.1f}x)".format("transfer", transfer, sequential / transfer))
+
+    for processes in args.processes:
+        parallel, parallel_bib = measure(bibtex_dblp.database.parse_bibtex_parallel, text, processes=processes, repeat=args.repeat)
+        assert list(parallel_bib.entries.keys()) == list(bib.entries.keys())
+        print("{:>12}: {:8.2f}s (speedup {:.2f}x)".format("{} processes".format(processes), parallel, sequential / parallel))
+
+
+if __name__ == "__main__":
+    main()
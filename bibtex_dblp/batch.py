@@ -0,0 +1,202 @@
+import csv
+import json
+import logging
+import re
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from requests.exceptions import RequestException
+
+import bibtex_dblp.dblp_api as dblp_api
+import bibtex_dblp.search
+
+# Errors of a single query which are reported without stopping the other queries.
+# Failed requests (e.g. unreachable host or timeout) raise a RequestException and unsuccessful searches raise an AssertionError.
+REQUEST_ERRORS = (RequestException, AssertionError, dblp_api.BudgetExhaustedException)
+
+
+class BatchResult:
+    """
+    Result of one query of a bulk import.
+    """
+
+    # Possible states of a result
+    IMPORTED = "imported"
+    PRESENT = "present"
+    AMBIGUOUS = "ambiguous"
+    NOT_FOUND = "not_found"
+    ERROR = "error"
+
+    def __init__(self, query, status, publication=None, bibtex=None, candidates=None, message=None):
+        """
+        Create result.
+        :param query: Search query.
+        :param status: Status of the result.
+        :param publication: Selected DBLP publication (if any).
+        :param bibtex: Bibtex of the selected publication (if imported).
+        :param candidates: Search results if the selection was ambiguous.
+        :param message: Additional message, e.g., for errors.
+        """
+        self.query = query
+        self.status = status
+        self.publication = publication
+        self.bibtex = bibtex
+        self.candidates = candidates if candidates is not None else []
+        self.message = message
+
+
+def read_queries(stream, input_format="lines"):
+    """
+    Read search queries.
+    :param stream: Input stream.
+    :param input_format: Format of the input:
+        'lines': one query per line, empty lines and lines starting with '#' are ignored,
+        'csv': CSV file with column 'query' (or 'title' or 'doi'), otherwise the first column is used,
+        'jsonl': one JSON object per line with key 'query' (or 'title' or 'doi').
+    :return: List of queries.
+    """
+    queries = []
+    if input_format == "lines":
+        for line in stream:
+            line = line.strip()
+            if line and not line.startswith("#"):
+                queries.append(line)
+    elif input_format == "csv":
+        reader = csv.reader(stream)
+        header = next(reader, None)
+        if header is None:
+            return queries
+        columns = [column.strip().lower() for column in header]
+        index = next((columns.index(name) for name in ["query", "title", "doi"] if name in columns), None)
+        if index is None:
+            # No header -> first row is already a query
+            index = 0
+            queries.append(header[0].strip())
+        queries.extend(row[index].strip() for row in reader if len(row) > index and row[index].strip())
+    elif input_format == "jsonl":
+        for line in stream:
+            if not line.strip():
+                continue
+            data = json.loads(line)
+            query = next((data[name] for name in ["query", "title", "doi"] if data.get(name)), None)
+            if query is None:
+                logging.warning("No query given in line '{}'. Skipping this line.".format(line.strip()))
+                continue
+            queries.append(query)
+    else:
+        raise ValueError("Unknown input format '{}'".format(input_format))
+    return queries
+
+
+def publication_text(publication):
+    """
+    Get text of publication for comparing it with a query.
+    :param publication: DBLP publication.
+    :return: String containing authors and title.
+    """
+    return "{}:{}".format(" and ".join([str(author) for author in publication.authors]), publication.title)
+
+
+def select_match(query, search_results, min_score=0.9):
+    """
+    Select a confident match for the query automatically.
+    A match is confident if it is the only result, if its DOI equals the query,
+    or if it is the only result containing (almost) all words of the query.
+    :param query: Search query.
+    :param search_results: List of search results.
+    :param min_score: Minimal search score of a confident match.
+    :return: Selected publication or None if no confident match exists.
+    """
+    if len(search_results) == 1:
+        return search_results[0].publication
+    for result in search_results:
+        if result.publication.doi is not None and dblp_api.normalize_doi(result.publication.doi) == dblp_api.normalize_doi(query):
+            return result.publication
+    words = " ".join(re.findall(r"\w+", query))
+    if not words:
+        return None
+    confident = [result.publication for result in search_results if bibtex_dblp.search.search_score(publication_text(result.publication), words) >= min_score]
+    if len(confident) == 1:
+        return confident[0]
+    return None
+
+
+def normalize_title(title):
+    """
+    Normalize title for comparison by only keeping lower case words.
+    :param title: Title.
+    :return: Normalized title.
+    """
+    return " ".join(re.findall(r"[^\W_]+", title.lower()))
+
+
+def _import_query(session, query, existing, lock, bib_format, max_search_results, min_score):
+    """
+    Search for query, select a match and fetch its bibtex.
+    :param existing: Set of DBLP ids, DOIs and normalized titles which are already present. Selected DBLP ids are added.
+    :param lock: Lock protecting existing.
+    :return: BatchResult.
+    """
+    if dblp_api.normalize_doi(query) in existing or normalize_title(query) in existing:
+        # Already present -> no search necessary
+        return BatchResult(query, BatchResult.PRESENT)
+    try:
+        search_results = dblp_api.search_publication(session, query, max_search_results=max_search_results)
+    except REQUEST_ERRORS as err:
+        return BatchResult(query, BatchResult.ERROR, message="Search request failed: {}".format(err))
+    if search_results.total_matches == 0:
+        return BatchResult(query, BatchResult.NOT_FOUND)
+    publication = select_match(query, search_results.results, min_score)
+    if publication is None:
+        return BatchResult(query, BatchResult.AMBIGUOUS, candidates=[result.publication for result in search_results.results])
+    with lock:
+        # Existing entries without DBLP id are recognized by their DOI or title
+        present = publication.key in existing or normalize_title(publication.title) in existing
+        if publication.doi is not None and dblp_api.normalize_doi(publication.doi) in existing:
+            present = True
+        if present:
+            return BatchResult(query, BatchResult.PRESENT, publication=publication)
+        existing.add(publication.key)
+    try:
+        bibtex = dblp_api.get_bibtex(session, publication.key, bib_format=bib_format)
+    except REQUEST_ERRORS + (dblp_api.InvalidDblpIdException,) as err:
+        # Publication was not imported -> other queries for it should not be reported as present
+        with lock:
+            existing.discard(publication.key)
+        return BatchResult(query, BatchResult.ERROR, publication=publication, message=str(err))
+    return BatchResult(query, BatchResult.IMPORTED, publication=publication, bibtex=bibtex)
+
+
+def import_queries(session, queries, bib=None, bib_format=dblp_api.BibFormat.condensed, max_search_results=30, min_score=0.9, workers=4):
+    """
+    Import publications for multiple queries.
+    The queries are processed concurrently. The rate limiting of the session is shared by all workers.
+    Publications already contained in the bibliography (same DBLP id, DOI or title) or imported by another query are skipped.
+    Queries which are equal to the DOI or the title of an existing entry are skipped without any request.
+    Failed requests are reported as errors of the respective query.
+    :param session: DBLP session.
+    :param queries: List of queries.
+    :param bib: Bibliography in pybtex format whose entries should not be imported again. Can be None.
+    :param bib_format: Bibtex format of DBLP.
+    :param max_search_results: Maximal number of search results per query.
+    :param min_score: Minimal search score for selecting a match automatically.
+    :param workers: Number of concurrent workers.
+    :return: List of BatchResult in the order of the queries.
+    """
+    existing = set()
+    if bib is not None:
+        for entry in bib.entries.values():
+            dblp_id = dblp_api.extract_dblp_id(entry)
+            if dblp_id is not None:
+                existing.add(dblp_id)
+            if "doi" in entry.fields:
+                existing.add(dblp_api.normalize_doi(entry.fields["doi"]))
+            if normalize_title(entry.fields.get("title", "")):
+                existing.add(normalize_title(entry.fields["title"]))
+
+    lock = threading.Lock()
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        futures = [executor.submit(_import_query, session, query, existing, lock, bib_format, max_search_results, min_score) for query in queries]
+        results = [future.result() for future in futures]
+    for result in results:
+        logging.debug("Query '{}': {}".format(result.query, result.status))
+    return results
@@ -0,0 +1,90 @@
+import hashlib
+import json
+import os
+import tempfile
+from pathlib import Path
+
+
+class CachedRecord:
+    """
+    Record stored in the cache together with its HTTP validators.
+    """
+
+    def __init__(self, url, content, etag=None, last_modified=None):
+        """
+        Create cached record.
+        :param url: URL of the record.
+        :param content: Content of the record as string.
+        :param etag: Value of the ETag header (if given).
+        :param last_modified: Value of the Last-Modified header (if given).
+        """
+        self.url = url
+        self.content = content
+        self.etag = etag
+        self.last_modified = last_modified
+
+    def validators(self):
+        """
+        Get headers for a conditional request to revalidate this record.
+        :return: Dictionary of headers.
+        """
+        headers = dict()
+        if self.etag is not None:
+            headers["If-None-Match"] = self.etag
+        if self.last_modified is not None:
+            headers["If-Modified-Since"] = self.last_modified
+        return headers
+
+
+class RecordCache:
+    """
+    Local store of DBLP records on disk.
+    Each record is stored as JSON file named after the hash of its URL.
+    """
+
+    def __init__(self, directory):
+        """
+        Create cache in directory. The directory is created if it does not exist.
+        :param directory: Path of cache directory.
+        """
+        self.directory = Path(directory)
+        self.directory.mkdir(parents=True, exist_ok=True)
+
+    def _path(self, url):
+        return self.directory / "{}.json".format(hashlib.sha256(url.encode("utf-8")).hexdigest())
+
+    def __contains__(self, url):
+        return self._path(url).exists()
+
+    def get(self, url):
+        """
+        Get cached record.
+        :param url: URL of the record.
+        :return: CachedRecord or None if the URL is not cached.
+        """
+        path = self._path(url)
+        try:
+            data = json.loads(path.read_text(encoding="utf-8"))
+        except (FileNotFoundError, ValueError):
+            return None
+        return CachedRecord(data["url"], data["content"], data.get("etag"), data.get("last_modified"))
+
+    def put(self, record):
+        """
+        Store record in cache. The file is replaced atomically.
+        :param record: CachedRecord.
+        """
+        data = dict(url=record.url, content=record.content, etag=record.etag, last_modified=record.last_modified)
+        fd, tmp_path = tempfile.mkstemp(dir=self.directory, suffix=".tmp")
+        with os.fdopen(fd, "w", encoding="utf-8") as f:
+            json.dump(data, f)
+        os.replace(tmp_path, self._path(record.url))
+
+    def records(self):
+        """
+        Iterate over all cached records.
+        :return: Generator of CachedRecord.
+        """
+        for path in sorted(self.directory.glob("*.json")):
+            data = json.loads(path.read_text(encoding="utf-8"))
+            yield CachedRecord(data["url"], data["content"], data.get("etag"), data.get("last_modified"))
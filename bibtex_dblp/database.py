@@ -1,35 +1,208 @@
 import logging
+import os
 import pybtex.database
+import pybtex.io
 import re
+import shutil
+import tempfile
+from concurrent.futures import ProcessPoolExecutor
 
 import bibtex_dblp.dblp_api as dblp_api
+import bibtex_dblp.lock
+import bibtex_dblp.profiling as profiling
 import bibtex_dblp.search
+import bibtex_dblp.stats as stats
 
+# Minimal number of bibtex commands per chunk when parsing in parallel
+MIN_CHUNK_COMMANDS = 500
 
-def load_from_file(infile):
+
+@profiling.phase("load")
+@stats.timed("bibtex.load")
+def load_from_file(infile, processes=1):
     """
     Load bibliography from file.
     :param infile: Path of input file.
+    :param processes: Number of processes used for parsing. If None, the number of CPUs is used.
     :return: Bibliography in pybtex format.
     """
-    return pybtex.database.parse_file(infile, bib_format="bibtex")
+    if processes == 1:
+        return pybtex.database.parse_file(infile, bib_format="bibtex")
+    with pybtex.io.open_unicode(infile) as f:
+        text = f.read()
+    return parse_bibtex_parallel(text, processes=processes)
+
+
+def split_bibtex(text):
+    """
+    Split bibtex string into its top-level commands (entries, @string, @preamble).
+    The splitting follows the behaviour of the pybtex parser: every '@' outside a command starts a new command
+    and the body of a @comment is treated as ordinary text.
+    :param text: String containing bibtex information.
+    :return: List of tuples (command name, start position, end position) in order of appearance.
+    """
+    commands = []
+    pos = 0
+    while True:
+        start = text.find("@", pos)
+        if start < 0:
+            return commands
+        match = _COMMAND_START.match(text, start)
+        if match is None:
+            # Not a valid command -> pybtex reports an error and continues after the '@'
+            pos = start + 1
+            continue
+        command = match.group(1)
+        if command.lower() == "comment":
+            pos = match.end()
+            continue
+        end = _find_command_end(text, match.end(), ")" if match.group(2) == "(" else "}")
+        if end is None:
+            # Unbalanced command -> keep remaining text together
+            commands.append((command, start, len(text)))
+            return commands
+        commands.append((command, start, end))
+        pos = end
+
+
+def entry_key(text, start):
+    """
+    Get the key of a bibtex entry without parsing it.
+    :param text: Bibtex string.
+    :param start: Start position of the entry (see split_bibtex).
+    :return: Key of entry or None if no valid key is found.
+    """
+    match = _ENTRY_KEY.match(text, start)
+    return None if match is None else match.group(1)
+
+
+_COMMAND_START = re.compile(r"@\s*([a-zA-Z!$&*+\-./:;<>?\[\]^_`|][a-zA-Z0-9!$&*+\-./:;<>?\[\]^_`|]*)\s*([{(])")
+
+
+def _find_command_end(text, pos, body_end):
+    """
+    Find the end of a command body.
+    :param text: Bibtex string.
+    :param pos: Position after the opening delimiter of the body.
+    :param body_end: Closing delimiter of the body.
+    :return: Position after the closing delimiter or None if the body is not closed.
+    """
+    level = 0
+    in_quotes = False
+    delimiters = _BRACE_DELIMITERS if body_end == "}" else _PAREN_DELIMITERS
+    for match in delimiters.finditer(text, pos):
+        char = match.group()
+        if char == "{":
+            level += 1
+        elif char == "}":
+            if level == 0:
+                if body_end == "}":
+                    return match.end()
+            else:
+                level -= 1
+        elif char == '"' and level == 0:
+            in_quotes = not in_quotes
+        elif char == ")" and body_end == ")" and level == 0 and not in_quotes:
+            return match.end()
+    return None
+
+
+_ENTRY_KEY = re.compile(r"@\s*[^\s{(]+\s*[{(]\s*([^\s\"#%'(),={}]+)")
+_BRACE_DELIMITERS = re.compile(r"[{}]")
+_PAREN_DELIMITERS = re.compile(r'[{}")]')
 
 
-def write_to_file(bib, outfile):
+def _parse_chunk(text):
+    """
+    Parse a chunk of a bibtex file.
+    :param text: String containing bibtex information.
+    :return: List of entries as tuples (key, entry), list of preamble values.
+    """
+    data = parse_bibtex(text)
+    return list(data.entries.items()), data.preamble_list
+
+
+def parse_bibtex_parallel(text, processes=None):
+    """
+    Parse bibtex string into pybtex format by using multiple processes.
+    The string is split into chunks at command boundaries and each chunk is parsed separately.
+    All macros defined by @string in previous chunks are prepended to the chunk.
+    The order of entries and the handling of duplicate keys are the same as for sequential parsing.
+    :param text: String containing bibtex information.
+    :param processes: Number of processes. If None, the number of CPUs is used.
+    :return: Bibliography in pybtex format.
+    """
+    if processes is None:
+        processes = os.cpu_count() or 1
+    if processes <= 1:
+        return parse_bibtex(text)
+    commands = split_bibtex(text)
+    no_chunks = min(processes * 4, len(commands) // MIN_CHUNK_COMMANDS)
+    if no_chunks <= 1:
+        return parse_bibtex(text)
+
+    # Build chunks
+    chunks = []
+    macros = ""
+    chunk_size = len(commands) / no_chunks
+    for i in range(no_chunks):
+        first = round(i * chunk_size)
+        last = round((i + 1) * chunk_size)
+        start = 0 if i == 0 else commands[first][1]
+        end = len(text) if i == no_chunks - 1 else commands[last][1]
+        chunks.append(macros + text[start:end])
+        # Remember macros for following chunks
+        macros += "".join(text[cmd_start:cmd_end] + "\n" for command, cmd_start, cmd_end in commands[first:last] if command.lower() == "string")
+
+    # Parse chunks and merge results in original order
+    bib = pybtex.database.BibliographyData()
+    with ProcessPoolExecutor(max_workers=processes) as executor:
+        for entries, preamble in executor.map(_parse_chunk, chunks):
+            for key, entry in entries:
+                bib.add_entry(key, entry)
+            bib.add_to_preamble(*preamble)
+    return bib
+
+
+@profiling.phase("write")
+@stats.timed("bibtex.write")
+def write_to_file(bib, outfile, check=None):
     """
     Write bibliography to file.
+    The file is replaced atomically, i.e., other programs (such as LaTeX or a file watcher) never see a partially written file.
     :param bib: Bibliography in pybtex format.
     :param outfile: Path of output file.
+    :param check: Optional function which is called directly before the file is replaced. If it returns False, nothing is written.
+    :return: Written content or None if nothing was written.
     """
-    bib.to_file(outfile, bib_format="bibtex")
+    content = bib.to_string(bib_format="bibtex")
 
     # Perform some custom changes
-    content = outfile.read_text(encoding="utf-8")
     # Replace multiple escape characters \\ before by a single one \
     content = re.sub(r"\\{2,}", r"\\", content)
-    outfile.write_text(content, encoding="utf-8")
+
+    fd, tmp_path = tempfile.mkstemp(dir=outfile.parent, prefix="." + outfile.name, suffix=".tmp")
+    try:
+        with os.fdopen(fd, "w", encoding="utf-8") as f:
+            f.write(content)
+        if outfile.exists():
+            shutil.copymode(outfile, tmp_path)
+        else:
+            # Use the default permissions for new files instead of the restrictive ones of mkstemp
+            umask = os.umask(0)
+            os.umask(umask)
+            os.chmod(tmp_path, 0o666 & ~umask)
+        if check is not None and not check():
+            os.unlink(tmp_path)
+            return None
+        os.replace(tmp_path, outfile)
+    except BaseException:
+        os.unlink(tmp_path)
+        raise
+    return content
 
 
+@stats.timed("bibtex.parse")
 def parse_bibtex(bibtex):
     """
     Parse bibtex string into pybtex format.
@@ -39,51 +212,73 @@ def parse_bibtex(bibtex):
     return pybtex.database.parse_string(bibtex, bib_format="bibtex")
 
 
-def convert_dblp_entries(session, bib, bib_format=dblp_api.BibFormat.condensed):
+def convert_dblp_entries(session, bib, bib_format=dblp_api.BibFormat.condensed, keys=None, prefetched=None, processed=None):
     """
     Convert bibtex entries according to DBLP bibtex format.
+    If the request budget of the session is exhausted, the conversion stops and the remaining entries are left unchanged.
     :param session: DBLP session.
     :param bib: Bibliography in pybtex format.
     :param bib_format: Bibtex format of DBLP.
+    :param keys: Keys of the entries to convert in the given order. If None, all entries are converted in the order of the bibliography.
+    :param prefetched: Dictionary from DBLP id to already fetched bibtex (see prefetch.prefetch_volumes). Can be None.
+    :param processed: Set to which the keys of all converted entries and of all entries without DBLP id are added. Can be None.
+        Skipped entries and entries not reached (e.g. because the budget is exhausted or an error occurred) are not added.
     :return: Converted bibliography, number of changed entries
     """
     logging.debug("Convert to format '{}'".format(bib_format))
     no_changes = 0
-    for entry_str, entry in bib.entries.items():
+    entries = bib.entries.items() if keys is None else [(key, bib.entries[key]) for key in keys]
+    for entry_str, entry in entries:
         # Check for id
-        dblp_id = dblp_api.extract_dblp_id(entry)
-        if dblp_id is not None:
+        with profiling.phase("resolve_ids"):
+            dblp_id = dblp_api.extract_dblp_id(entry)
+        if dblp_id is None:
+            if processed is not None:
+                processed.add(entry_str)
+        else:
             logging.debug("Found DBLP id '{}'".format(dblp_id))
             try:
-                result_dblp = dblp_api.get_bibtex(session, dblp_id, bib_format=bib_format)
-            except dblp_api.InvalidDblpIdException as err:
+                with profiling.phase("fetch"):
+                    if prefetched is not None and dblp_id in prefetched:
+                        result_dblp = prefetched[dblp_id]
+                    else:
+                        result_dblp = dblp_api.get_bibtex(session, dblp_id, bib_format=bib_format)
+            except (dblp_api.InvalidDblpIdException, bibtex_dblp.lock.RecordNotLockedException) as err:
                 logging.warning(str(err) + ". Skipping this entry.")
                 continue
+            except dblp_api.BudgetExhaustedException as err:
+                logging.warning(str(err) + ". Stopping the conversion.")
+                break
 
-            data = parse_bibtex(result_dblp)
+            with profiling.phase("parse"):
+                data = parse_bibtex(result_dblp)
             assert len(data.entries) <= 2 if bib_format is dblp_api.BibFormat.crossref else len(data.entries) == 1
-            if entry_str not in data.entries:
-                # DBLP key is not used as bibtex key -> remember DBLP key
-                key = next(iter(data.entries))
-                new_entry = data.entries[key]
-                new_entry.fields["biburl"] = entry.fields["biburl"]
-                bib.entries[entry_str] = new_entry
+            with profiling.phase("merge"):
+                if entry_str not in data.entries:
+                    # DBLP key is not used as bibtex key -> remember DBLP key
+                    key = next(iter(data.entries))
+                    new_entry = data.entries[key]
+                    new_entry.fields["biburl"] = entry.fields["biburl"]
+                    bib.entries[entry_str] = new_entry
 
-            else:
-                new_entry = data.entries[entry_str]
-                # Set new format
-                bib.entries[entry_str] = new_entry
-                if bib_format is dblp_api.BibFormat.crossref:
-                    # Possible second entry
-                    for data_key, data_entry in data.entries.items():
-                        if data_key != entry_str:
-                            if data_key not in bib.entries:
-                                bib.entries[data_key] = data_entry
+                else:
+                    new_entry = data.entries[entry_str]
+                    # Set new format
+                    bib.entries[entry_str] = new_entry
+                    if bib_format is dblp_api.BibFormat.crossref:
+                        # Possible second entry
+                        for data_key, data_entry in data.entries.items():
+                            if data_key != entry_str:
+                                if data_key not in bib.entries:
+                                    bib.entries[data_key] = data_entry
             logging.debug("Set new entry for '{}'".format(entry_str))
             no_changes += 1
+            if processed is not None:
+                processed.add(entry_str)
     return bib, no_changes
 
 
+@profiling.phase("modify")
 def modify_entries(bib, remove_escapes=False, remove_timestamp=False, remove_biburl=False, remove_bibsource=False):
     """
     Modify bibtex entries.
@@ -111,6 +306,7 @@ def modify_entries(bib, remove_escapes=False, remove_timestamp=False, remove_bib
     return bib
 
 
+@stats.timed("bibtex.search")
 def search(bib, search_string):
     """
     Search for string in bibliography.
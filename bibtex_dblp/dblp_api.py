@@ -1,15 +1,54 @@
+import logging
 import re
+import threading
+import time
 from enum import Enum
 from requests.exceptions import HTTPError
 from requests_ratelimiter import LimiterSession
 
+import bibtex_dblp.cache
 import bibtex_dblp.dblp_data
+import bibtex_dblp.lock
+import bibtex_dblp.stats as stats
 
 
 class InvalidDblpIdException(Exception):
     pass
 
 
+class BudgetExhaustedException(Exception):
+    pass
+
+
+class RequestBudget:
+    """
+    Budget limiting the number of requests and/or the time of a run.
+    """
+
+    def __init__(self, max_requests=None, time_budget=None):
+        """
+        Create budget. The time budget starts with the creation of the budget.
+        :param max_requests: Maximal number of requests. If None, the number is not limited.
+        :param time_budget: Maximal time in seconds. If None, the time is not limited.
+        """
+        self.max_requests = max_requests
+        self.deadline = None if time_budget is None else time.monotonic() + time_budget
+        self.used_requests = 0
+        self.lock = threading.Lock()
+
+    def consume(self):
+        """
+        Consume budget for one request.
+        :raises: BudgetExhaustedException if the budget is exhausted.
+        """
+        with self.lock:
+            if self.max_requests is not None and self.used_requests >= self.max_requests:
+                raise BudgetExhaustedException("Budget of {} requests is exhausted".format(self.max_requests))
+            if self.deadline is not None and time.monotonic() >= self.deadline:
+                raise BudgetExhaustedException("Time budget is exhausted")
+            self.used_requests += 1
+
+
 class BibFormat(Enum):
     """
     Format of DBLP bibtex.
@@ -46,11 +85,19 @@ class DblpSession:
     Needed for rate limiting.
     """
 
-    def __init__(self, wait_time, dblp_base_url="https://dblp.org"):
+    # Number of consecutive requests allowed before the rate limiting applies
+    BURST = 3
+
+    def __init__(self, wait_time, dblp_base_url="https://dblp.org", cache_dir=None, revalidate=False, budget=None, lock=None):
         """
         Create a session for DBLP.
         :param wait_time: Time in seconds to sleep before retrying.
         :param dblp_base_url: Base URL for DBLP.
+        :param cache_dir: Directory for storing fetched records locally. If None, no records are stored.
+        :param revalidate: Whether cached records are revalidated with DBLP by conditional requests.
+            If False, cached records are used without any request.
+        :param budget: RequestBudget limiting the requests. If None, requests are not limited.
+        :param lock: RecordLock pinning the bibtex of records. If None, no lockfile is used.
         """
         self.base_url = dblp_base_url
         self.wait_time = wait_time
@@ -58,7 +105,12 @@ class DblpSession:
         self.publication_search_url = self.base_url + "/search/publ/api"
         self.publication_bibtex = self.base_url + "/rec/{key}.bib?param={bib_format}"
 
-        self.session = LimiterSession(per_second=1.0 / wait_time, per_minute=60.0 / wait_time, burst=3)
+        self.session = LimiterSession(per_second=1.0 / wait_time, per_minute=60.0 / wait_time, burst=self.BURST)
+
+        self.cache = None if cache_dir is None else bibtex_dblp.cache.RecordCache(cache_dir)
+        self.revalidate = revalidate
+        self.budget = budget
+        self.lock = lock
 
     def perform_request(self, url, params=None, **kwargs):
         """
@@ -68,11 +120,52 @@ class DblpSession:
         :param kwargs: Optional arguments.
         :return: Response.
         :raises: HTTPError if request was unsuccessful.
+        :raises: BudgetExhaustedException if the request budget is exhausted.
         """
-        response = self.session.get(url, params=params, **kwargs)
+        if self.budget is not None:
+            self.budget.consume()
+        start = time.perf_counter()
+        try:
+            response = self.session.get(url, params=params, **kwargs)
+        finally:
+            duration = time.perf_counter() - start
+            stats.increment("dblp.requests")
+            stats.record_time("dblp.request", duration)
+        # Time not spent on the HTTP request itself is spent waiting for the rate limiter
+        latency = response.elapsed.total_seconds()
+        stats.record_time("dblp.http_latency", latency)
+        stats.record_time("dblp.rate_limit_wait", max(0.0, duration - latency))
+        if not response.ok:
+            stats.increment("dblp.errors.{}".format(response.status_code))
         response.raise_for_status()
         return response
 
+    def get_record(self, url):
+        """
+        Get the content of a DBLP record.
+        If a cache is used, cached records are returned directly or revalidated by a conditional request.
+        A response '304 Not Modified' then only transfers the headers.
+        :param url: URL of the record.
+        :return: Content of record as string.
+        :raises: HTTPError if request was unsuccessful.
+        """
+        cached = None if self.cache is None else self.cache.get(url)
+        if cached is not None and not self.revalidate:
+            stats.increment("dblp.cache.hit")
+            return cached.content
+
+        response = self.perform_request(url, headers=None if cached is None else cached.validators())
+        if response.status_code == 304:
+            stats.increment("dblp.cache.hit")
+            stats.increment("dblp.cache.revalidated")
+            return cached.content
+
+        stats.increment("dblp.cache.miss")
+        content = response.content.decode("utf-8")
+        if self.cache is not None:
+            self.cache.put(bibtex_dblp.cache.CachedRecord(url, content, response.headers.get("ETag"), response.headers.get("Last-Modified")))
+        return content
+
 
 def extract_dblp_id(entry):
     """
@@ -93,6 +186,7 @@ def extract_dblp_id(entry):
     return None
 
 
+@stats.timed("dblp.get_bibtex")
 def get_bibtex(session, dblp_id, bib_format=BibFormat.condensed):
     """
     Get bibtex entry in specified format.
@@ -100,21 +194,48 @@ def get_bibtex(session, dblp_id, bib_format=BibFormat.condensed):
     :param dblp_id: DBLP id for entry.
     :param bib_format: Format of bibtex export (see BibFormat).
     :return: Bibtex as binary string.
+    :raises: RecordNotLockedException if a frozen lockfile is used and it does not contain the record.
     """
+    if session.lock is not None:
+        bibtex = session.lock.get(dblp_id, bib_format)
+        if bibtex is not None:
+            stats.increment("dblp.lock.hit")
+            return bibtex
+        if session.lock.frozen:
+            raise bibtex_dblp.lock.RecordNotLockedException("Record '{}' ({}) is not contained in lockfile {}".format(dblp_id, bib_format, session.lock.path))
+        stats.increment("dblp.lock.miss")
+
     try:
-        resp = session.perform_request(session.publication_bibtex.format(key=dblp_id, bib_format=bib_format.bib_url()))
+        bibtex = session.get_record(session.publication_bibtex.format(key=dblp_id, bib_format=bib_format.bib_url()))
     except HTTPError as err:
         if err.response.status_code == 404:
             raise InvalidDblpIdException("Invalid DBLP id '{}'".format(dblp_id))
         else:
             raise err
 
-    bibtex = resp.content.decode("utf-8")
+    standard_bibtex = None
+    if bib_format == BibFormat.condensed_doi:
+        # Also get DOI from standard format
+        standard_bibtex = session.get_record(session.publication_bibtex.format(key=dblp_id, bib_format=BibFormat.standard.bib_url()))
+    bibtex = finalize_bibtex(dblp_id, bibtex, bib_format=bib_format, standard_bibtex=standard_bibtex)
 
+    if session.lock is not None:
+        session.lock.put(dblp_id, bib_format, bibtex)
+    return bibtex
+
+
+def finalize_bibtex(dblp_id, bibtex, bib_format=BibFormat.condensed, standard_bibtex=None):
+    """
+    Finalize the bibtex of a record as obtained from DBLP according to the specified format.
+    :param dblp_id: DBLP id for entry.
+    :param bibtex: Bibtex of record from DBLP.
+    :param bib_format: Format of bibtex export (see BibFormat).
+    :param standard_bibtex: Bibtex of record in standard format. Only needed for format 'condensed_doi'.
+    :return: Bibtex.
+    """
     if bib_format == BibFormat.condensed_doi:
-        # Also get DOI and insert it into bibtex
-        resp = session.perform_request(session.publication_bibtex.format(key=dblp_id, bib_format=BibFormat.standard.bib_url()))
-        lines = resp.content.decode("utf-8").split("\n")
+        # Insert DOI into bibtex
+        lines = standard_bibtex.split("\n")
         keep_lines = [line for line in lines if line.startswith("  doi")]
         assert len(keep_lines) <= 1
         if keep_lines:
@@ -127,10 +248,10 @@ def get_bibtex(session, dblp_id, bib_format=BibFormat.condensed):
         assert "biburl" not in bibtex
         biburl = "  biburl = {{https://dblp.org/rec/{}.bib}}".format(dblp_id)
         bibtex = bibtex[:-4] + ",\n" + biburl + bibtex[-4:]
-
     return bibtex
 
 
+@stats.timed("dblp.search_publication")
 def search_publication(session, pub_query, max_search_results):
     """
     Search for publication according to given query.
@@ -145,3 +266,67 @@ def search_publication(session, pub_query, max_search_results):
     results = bibtex_dblp.dblp_data.DblpSearchResults(resp.json())
     assert results.status_code == 200
     return results
+
+
+def normalize_doi(doi):
+    """
+    Normalize DOI for comparison.
+    Removes URL prefixes and escape characters and converts to lower case.
+    :param doi: DOI.
+    :return: Normalized DOI.
+    """
+    doi = doi.strip().replace("\\_", "_").lower()
+    doi = re.sub(r"^(https?://(dx\.)?doi\.org/|doi:)", "", doi)
+    return doi
+
+
+def cached_doi_index(session):
+    """
+    Build map from DOIs to DBLP ids from the records in the local cache of the session.
+    :param session: DBLP session.
+    :return: Dictionary from normalized DOI to DBLP id.
+    """
+    index = dict()
+    if session.cache is None:
+        return index
+    url_pattern = re.compile(re.escape(session.publication_bibtex).replace(re.escape("{key}"), "(.*)").replace(re.escape("{bib_format}"), ".*"))
+    for record in session.cache.records():
+        match_url = url_pattern.fullmatch(record.url)
+        match_doi = re.search(r"^\s*doi\s*=\s*\{(.*)\},?$", record.content, flags=re.MULTILINE)
+        if match_url and match_doi:
+            index[normalize_doi(match_doi.group(1))] = match_url.group(1)
+    return index
+
+
+def resolve_dois(session, dois, batch_size=10):
+    """
+    Resolve DOIs to DBLP ids by exact lookup.
+    DOIs are first looked up in the local cache. The remaining DOIs are searched on DBLP in batches
+    where one search query contains multiple DOIs combined by '|' (boolean OR).
+    Only search results whose DOI is exactly one of the given DOIs are used.
+    If the request budget of the session is exhausted, the DOIs resolved so far are returned.
+    :param session: DBLP session.
+    :param dois: List of DOIs.
+    :param batch_size: Number of DOIs per search query.
+    :return: Dictionary from normalized DOI to DBLP id. DOIs which could not be resolved are not contained.
+    """
+    dois = list(dict.fromkeys(normalize_doi(doi) for doi in dois))
+    index = cached_doi_index(session)
+    resolved = {doi: index[doi] for doi in dois if doi in index}
+    pending = [doi for doi in dois if doi not in resolved]
+    for i in range(0, len(pending), batch_size):
+        batch = pending[i : i + batch_size]
+        try:
+            search_results = search_publication(session, "|".join(batch), max_search_results=3 * len(batch))
+        except HTTPError as err:
+            logging.warning("Search request for DOIs returned error {}.".format(err))
+            continue
+        except BudgetExhaustedException as err:
+            logging.warning(str(err) + ". Stopping the DOI lookup.")
+            break
+        for result in search_results.results:
+            publication = result.publication
+            if publication.doi is not None and normalize_doi(publication.doi) in batch:
+                resolved[normalize_doi(publication.doi)] = publication.key
+    logging.debug("Resolved {} of {} DOIs".format(len(resolved), len(dois)))
+    return resolved
@@ -25,6 +25,13 @@ class DblpSearchResult:
         self.score = json["@score"]
         self.publication = DblpPublication(json["info"])
 
+    def to_json(self):
+        """
+        Get search result as JSON-serializable dictionary.
+        :return: Dictionary.
+        """
+        return dict(score=self.score, publication=self.publication.to_json())
+
 
 class DblpPublication:
     """
@@ -58,6 +65,26 @@ class DblpPublication:
     def cite_key(self):
         return "DBLP:" + self.key
 
+    def to_json(self):
+        """
+        Get publication as JSON-serializable dictionary.
+        :return: Dictionary.
+        """
+        return dict(
+            key=self.key,
+            title=self.title,
+            authors=[author.to_json() for author in self.authors],
+            venue=self.venue,
+            booktitle=self.booktitle,
+            volume=self.volume,
+            pages=self.pages,
+            year=self.year,
+            type=self.type,
+            doi=self.doi,
+            ee=self.ee,
+            url=self.url,
+        )
+
     def __str__(self):
         s = ", ".join([str(author) for author in self.authors])
         s += ":\n\t"
@@ -79,5 +106,12 @@ class DblpAuthor:
         self.name = json.get("text")
         self.pid = json.get("pid")
 
+    def to_json(self):
+        """
+        Get author as JSON-serializable dictionary.
+        :return: Dictionary.
+        """
+        return dict(name=self.name, pid=self.pid)
+
     def __str__(self):
         return self.name
@@ -0,0 +1,221 @@
+import hashlib
+import logging
+import random
+import re
+from collections import defaultdict
+
+import bibtex_dblp.dblp_api as dblp_api
+import bibtex_dblp.search
+
+# Number of bands and rows per band used for LSH. The number of hash functions in a MinHash signature is BANDS * ROWS.
+# Pairs with a Jaccard similarity of at least (1/BANDS)^(1/ROWS) ~ 0.55 are very likely to become candidates.
+BANDS = 16
+ROWS = 4
+
+# Fixed masks to obtain different hash functions from one 64 bit hash
+_MASKS = [random.Random(42 + i).getrandbits(64) for i in range(BANDS * ROWS)]
+
+
+def normalize_entry(entry):
+    """
+    Get normalized text of entry consisting of the last names of the authors and the title.
+    LaTeX commands, braces and punctuation are removed and everything is lower case.
+    :param entry: Pybtex entry.
+    :return: Normalized string.
+    """
+    if "author" in entry.persons:
+        authors = " ".join([" ".join(author.last_names) for author in entry.persons["author"]])
+    elif "organization" in entry.fields:
+        authors = str(entry.fields["organization"])
+    else:
+        authors = ""
+    title = entry.fields.get("title", "")
+    text = "{} {}".format(authors, title).lower()
+    # Remove LaTeX commands such as \"{a} or \&
+    text = re.sub(r"\\[a-z]+|\\.", "", text)
+    return " ".join(re.findall(r"[^\W_]+", text))
+
+
+def shingles(text):
+    """
+    Get shingles of normalized text.
+    The shingles are all single words and all pairs of consecutive words.
+    :param text: Normalized string.
+    :return: Set of shingles.
+    """
+    words = text.split()
+    return set(words) | {"{} {}".format(w1, w2) for w1, w2 in zip(words, words[1:])}
+
+
+def minhash_signature(entry_shingles, hash_cache=None):
+    """
+    Compute MinHash signature of set of shingles.
+    :param entry_shingles: Set of shingles.
+    :param hash_cache: Optional dictionary which caches the hash value of shingles.
+    :return: Tuple of minimal hash values (one per hash function).
+    """
+    if hash_cache is None:
+        hash_cache = dict()
+    hashes = []
+    for shingle in entry_shingles:
+        value = hash_cache.get(shingle)
+        if value is None:
+            value = int.from_bytes(hashlib.blake2b(shingle.encode("utf-8"), digest_size=8).digest(), "little")
+            hash_cache[shingle] = value
+        hashes.append(value)
+    if not hashes:
+        return None
+    return tuple(min(map(mask.__xor__, hashes)) for mask in _MASKS)
+
+
+def candidate_pairs(signatures):
+    """
+    Find candidate pairs of similar entries by using LSH banding on the MinHash signatures.
+    Two entries become a candidate pair if their signatures agree on all rows of at least one band.
+    :param signatures: Dictionary from keys to MinHash signatures.
+    :return: Set of candidate pairs (key1, key2).
+    """
+    pairs = set()
+    for band in range(BANDS):
+        buckets = defaultdict(list)
+        for key, signature in signatures.items():
+            buckets[signature[band * ROWS : (band + 1) * ROWS]].append(key)
+        for keys in buckets.values():
+            for i in range(len(keys)):
+                for j in range(i + 1, len(keys)):
+                    pairs.add((keys[i], keys[j]))
+    return pairs
+
+
+def similarity(text1, text2):
+    """
+    Compute similarity of two normalized strings.
+    The score is the minimum of the search scores of one string as query for the other string.
+    :param text1: Normalized string.
+    :param text2: Normalized string.
+    :return: Score in [0,1].
+    """
+    if not text1 or not text2:
+        return 0
+    return min(bibtex_dblp.search.search_score(text1, text2), bibtex_dblp.search.search_score(text2, text1))
+
+
+def entry_attributes(entry):
+    """
+    Get attributes of entry which must agree for duplicates.
+    :param entry: Pybtex entry.
+    :return: Tuple (DBLP id, year, entry type, normalized venue). Missing attributes are None.
+    """
+    venue = entry.fields.get("booktitle", entry.fields.get("journal"))
+    if venue is not None:
+        venue = " ".join(re.findall(r"[^\W_]+", re.sub(r"\\[a-z]+|\\.", "", venue.lower()))) or None
+    year = entry.fields.get("year")
+    return dblp_api.extract_dblp_id(entry), None if year is None else year.strip(), entry.type.lower(), venue
+
+
+def compatible(attributes1, attributes2):
+    """
+    Check whether two entries (or clusters) with the given attributes can be duplicates.
+    Different DBLP ids, years, entry types or venues are different publications, e.g., the conference and the journal version of a paper.
+    Attributes which are missing in one entry are ignored. Venues are compatible if one is contained in the other.
+    :param attributes1: Attributes (see entry_attributes).
+    :param attributes2: Attributes (see entry_attributes).
+    :return: True iff the attributes are compatible.
+    """
+    for i, (value1, value2) in enumerate(zip(attributes1, attributes2)):
+        if value1 is None or value2 is None or value1 == value2:
+            continue
+        if i == 3 and (value1 in value2 or value2 in value1):
+            continue
+        return False
+    return True
+
+
+def merge_attributes(attributes1, attributes2):
+    """
+    Merge the attributes of two compatible clusters.
+    :return: Attributes where missing values are taken from the other cluster.
+    """
+    return tuple(value1 if value1 is not None else value2 for value1, value2 in zip(attributes1, attributes2))
+
+
+def find_duplicates(bib, threshold=0.9):
+    """
+    Find clusters of near-duplicate entries in bibliography.
+    Candidates are found with MinHash and LSH which avoids comparing all pairs of entries.
+    Each candidate pair is then confirmed by comparing authors and title.
+    Entries are only clustered if their DBLP ids, years, entry types and venues are compatible (see compatible).
+    :param bib: Bibliography in pybtex format.
+    :param threshold: Minimal similarity score for two entries to be considered duplicates.
+    :return: List of clusters. Each cluster is a list of at least two keys in order of the bibliography.
+    """
+    texts = dict()
+    signatures = dict()
+    hash_cache = dict()
+    # Attributes of each cluster (stored for the root of the cluster)
+    attributes = dict()
+    for entry_str, entry in bib.entries.items():
+        text = normalize_entry(entry)
+        signature = minhash_signature(shingles(text), hash_cache)
+        if signature is not None:
+            texts[entry_str] = text
+            signatures[entry_str] = signature
+            attributes[entry_str] = entry_attributes(entry)
+
+    # Union-find over confirmed pairs
+    parent = {key: key for key in signatures}
+
+    def find(key):
+        while parent[key] != key:
+            parent[key] = parent[parent[key]]
+            key = parent[key]
+        return key
+
+    def union(key1, key2):
+        # Clusters are only merged if all their entries stay compatible
+        root1, root2 = find(key1), find(key2)
+        if root1 == root2 or not compatible(attributes[root1], attributes[root2]):
+            return
+        parent[root1] = root2
+        attributes[root2] = merge_attributes(attributes[root1], attributes[root2])
+
+    # Entries with identical text and attributes are merged directly and only one representative is used for LSH
+    representatives = dict()
+    for entry_str, text in texts.items():
+        group = (text, attributes[entry_str])
+        if group in representatives:
+            union(entry_str, representatives[group])
+        else:
+            representatives[group] = entry_str
+    signatures = {key: signatures[key] for key in representatives.values()}
+
+    for key1, key2 in candidate_pairs(signatures):
+        if similarity(texts[key1], texts[key2]) >= threshold:
+            logging.debug("Found duplicates '{}' and '{}'".format(key1, key2))
+            union(key1, key2)
+
+    clusters = defaultdict(list)
+    for entry_str in bib.entries.keys():
+        if entry_str in parent:
+            clusters[find(entry_str)].append(entry_str)
+    return [cluster for cluster in clusters.values() if len(cluster) > 1]
+
+
+def merge_duplicates(bib, clusters):
+    """
+    Merge clusters of duplicate entries into a single entry each.
+    The first entry with a DBLP id is kept. If no entry has a DBLP id, the first entry of the cluster is kept.
+    :param bib: Bibliography in pybtex format.
+    :param clusters: List of clusters of duplicate keys (see find_duplicates).
+    :return: Modified bibliography, dictionary mapping the removed keys to the kept key.
+    """
+    removed = dict()
+    for cluster in clusters:
+        kept = next((key for key in cluster if dblp_api.extract_dblp_id(bib.entries[key]) is not None), cluster[0])
+        for key in cluster:
+            if key != kept:
+                del bib.entries[key]
+                removed[key] = kept
+                # Citations of the removed key must be updated
+                logging.warning("Merged duplicate entry '{}' into '{}'".format(key, kept))
+    return bib, removed
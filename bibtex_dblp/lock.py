@@ -0,0 +1,156 @@
+import datetime
+import hashlib
+import json
+import os
+import tempfile
+import threading
+from pathlib import Path
+
+# Version of the lockfile format
+LOCK_VERSION = 1
+
+
+class RecordNotLockedException(Exception):
+    pass
+
+
+class LockfileError(Exception):
+    pass
+
+
+def content_hash(content):
+    """
+    Compute the hash addressing a record in the lockfile.
+    :param content: Content of record as string.
+    :return: Hash as string.
+    """
+    return "sha256:" + hashlib.sha256(content.encode("utf-8")).hexdigest()
+
+
+class RecordLock:
+    """
+    Lockfile pinning the bibtex obtained from DBLP for each pair of DBLP id and format.
+    The bibtex is stored once per content hash and each pair refers to the hash of its bibtex.
+    If the lock is frozen, all bibtex must be contained in the lockfile and DBLP is never contacted.
+    Otherwise, new and stale records are fetched from DBLP and added to the lockfile.
+    """
+
+    def __init__(self, path, frozen=True, max_age=None):
+        """
+        Create lock. The lockfile is read if it exists.
+        :param path: Path of the lockfile.
+        :param frozen: Whether only records from the lockfile are used.
+        :param max_age: Age in days after which a record is stale and fetched again (if not frozen). If None, records never become stale.
+        """
+        self.path = Path(path)
+        self.frozen = frozen
+        self.max_age = max_age
+        # Map from DBLP id to map from format to tuple (hash, time of fetching)
+        self.records = dict()
+        # Map from hash to bibtex
+        self.objects = dict()
+        self.changed = False
+        self.lock = threading.Lock()
+        if self.path.exists():
+            self._read()
+
+    def _read(self):
+        try:
+            data = json.loads(self.path.read_text(encoding="utf-8"))
+        except ValueError as err:
+            raise LockfileError("Lockfile {} is not valid JSON: {}".format(self.path, err))
+        if data.get("version") != LOCK_VERSION:
+            raise LockfileError("Lockfile {} has unsupported version {}".format(self.path, data.get("version")))
+        for digest, content in data["objects"].items():
+            if content_hash(content) != digest:
+                raise LockfileError("Lockfile {} is corrupted: content does not match hash {}".format(self.path, digest))
+            self.objects[digest] = content
+        for dblp_id, formats in data["records"].items():
+            self.records[dblp_id] = dict()
+            for bib_format, record in formats.items():
+                if record["hash"] not in self.objects:
+                    raise LockfileError("Lockfile {} is corrupted: missing content for '{}' ({})".format(self.path, dblp_id, bib_format))
+                self.records[dblp_id][bib_format] = (record["hash"], record["fetched"])
+
+    def is_stale(self, fetched):
+        """
+        Check whether a record is stale.
+        :param fetched: Time of fetching in ISO format.
+        :return: True iff the record is older than the maximal age.
+        """
+        if self.max_age is None:
+            return False
+        age = datetime.datetime.now(datetime.timezone.utc) - datetime.datetime.fromisoformat(fetched)
+        return age > datetime.timedelta(days=self.max_age)
+
+    def get(self, dblp_id, bib_format):
+        """
+        Get locked bibtex.
+        :param dblp_id: DBLP id.
+        :param bib_format: Bibtex format of DBLP.
+        :return: Bibtex or None if the record is not locked or if it is stale and the lock is not frozen.
+        """
+        with self.lock:
+            record = self.records.get(dblp_id, dict()).get(str(bib_format))
+        if record is None:
+            return None
+        digest, fetched = record
+        if not self.frozen and self.is_stale(fetched):
+            return None
+        return self.objects[digest]
+
+    def put(self, dblp_id, bib_format, bibtex):
+        """
+        Lock bibtex.
+        :param dblp_id: DBLP id.
+        :param bib_format: Bibtex format of DBLP.
+        :param bibtex: Bibtex as fetched from DBLP.
+        """
+        digest = content_hash(bibtex)
+        fetched = datetime.datetime.now(datetime.timezone.utc).isoformat(timespec="seconds")
+        with self.lock:
+            self.objects[digest] = bibtex
+            self.records.setdefault(dblp_id, dict())[str(bib_format)] = (digest, fetched)
+            self.changed = True
+
+    def missing(self, dblp_ids, bib_format):
+        """
+        Get DBLP ids whose bibtex is not locked.
+        :param dblp_ids: List of DBLP ids.
+        :param bib_format: Bibtex format of DBLP.
+        :return: List of DBLP ids which are not locked.
+        """
+        return [dblp_id for dblp_id in dblp_ids if str(bib_format) not in self.records.get(dblp_id, dict())]
+
+    def prune(self, dblp_ids):
+        """
+        Remove all records whose DBLP id is not in the given ids.
+        :param dblp_ids: DBLP ids to keep.
+        """
+        dblp_ids = set(dblp_ids)
+        with self.lock:
+            for dblp_id in list(self.records):
+                if dblp_id not in dblp_ids:
+                    del self.records[dblp_id]
+                    self.changed = True
+
+    def save(self):
+        """
+        Write the lockfile atomically. Content which is no longer referenced is removed.
+        """
+        with self.lock:
+            used = {digest for formats in self.records.values() for digest, _ in formats.values()}
+            data = dict(
+                version=LOCK_VERSION,
+                records={
+                    dblp_id: {bib_format: dict(hash=digest, fetched=fetched) for bib_format, (digest, fetched) in sorted(formats.items())}
+                    for dblp_id, formats in sorted(self.records.items())
+                },
+                objects={digest: content for digest, content in sorted(self.objects.items()) if digest in used},
+            )
+            fd, tmp_path = tempfile.mkstemp(dir=self.path.parent, prefix="." + self.path.name, suffix=".tmp")
+            with os.fdopen(fd, "w", encoding="utf-8") as f:
+                json.dump(data, f, indent=1)
+                f.write("\n")
+            os.replace(tmp_path, self.path)
+            self.changed = False
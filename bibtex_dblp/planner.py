@@ -0,0 +1,194 @@
+import datetime
+import math
+
+import bibtex_dblp.dblp_api as dblp_api
+from bibtex_dblp.dblp_api import BibFormat
+
+
+class Plan:
+    """
+    Estimated work of a run before performing any requests.
+    """
+
+    def __init__(self, session, bib_format):
+        """
+        Create empty plan.
+        :param session: DBLP session.
+        :param bib_format: Bibtex format of DBLP used for the run.
+        """
+        self.wait_time = session.wait_time
+        self.burst = session.BURST
+        self.bib_format = bib_format
+        # Number of entries which need work
+        self.entries = 0
+        # Number of entries which are expected to be served from the local cache or the lockfile
+        self.cache_hits = 0
+        # Minimal and maximal number of requests for each format
+        self.requests_per_format = {fmt: (0, 0) for fmt in BibFormat}
+
+    def add_requests(self, min_requests, max_requests=None, bib_format=None):
+        """
+        Add expected requests.
+        :param min_requests: Minimal number of requests.
+        :param max_requests: Maximal number of requests. If None, it is equal to the minimal number.
+        :param bib_format: Format for which the requests are needed. If None, the requests are needed for all formats.
+        """
+        if max_requests is None:
+            max_requests = min_requests
+        for fmt in BibFormat if bib_format is None else [bib_format]:
+            current_min, current_max = self.requests_per_format[fmt]
+            self.requests_per_format[fmt] = (current_min + min_requests, current_max + max_requests)
+
+    def requests(self):
+        """
+        Get minimal and maximal number of requests for the format of the run.
+        :return: Tuple (min, max).
+        """
+        return self.requests_per_format[self.bib_format]
+
+    def estimated_time(self, requests):
+        """
+        Estimate wall time for the given number of requests under the current rate limiting.
+        :param requests: Number of requests.
+        :return: Time in seconds.
+        """
+        return max(0, requests - self.burst) * self.wait_time
+
+    def __str__(self):
+        def format_range(values):
+            return str(values[0]) if values[0] == values[1] else "{}-{}".format(values[0], values[1])
+
+        min_requests, max_requests = self.requests()
+        min_time = datetime.timedelta(seconds=round(self.estimated_time(min_requests)))
+        max_time = datetime.timedelta(seconds=round(self.estimated_time(max_requests)))
+        lines = ["Plan for format '{}':".format(self.bib_format)]
+        lines.append("  Entries to process:   {}".format(self.entries))
+        lines.append("  Expected cache hits:  {}".format(self.cache_hits))
+        lines.append("  Expected requests:    {}".format(format_range((min_requests, max_requests))))
+        lines.append(
+            "  Requests per format:  {}".format(", ".join("{}: {}".format(fmt, format_range(values)) for fmt, values in self.requests_per_format.items()))
+        )
+        lines.append(
+            "  Estimated time:       {} (with {}s between requests)".format(
+                min_time if min_time == max_time else "{} - {}".format(min_time, max_time), self.wait_time
+            )
+        )
+        return "\n".join(lines)
+
+
+def record_urls(session, dblp_id, bib_format):
+    """
+    Get URLs of all records which are needed to obtain the bibtex of an entry (see dblp_api.get_bibtex).
+    :param session: DBLP session.
+    :param dblp_id: DBLP id.
+    :param bib_format: Bibtex format of DBLP.
+    :return: List of URLs.
+    """
+    urls = [session.publication_bibtex.format(key=dblp_id, bib_format=bib_format.bib_url())]
+    if bib_format is BibFormat.condensed_doi:
+        urls.append(session.publication_bibtex.format(key=dblp_id, bib_format=BibFormat.standard.bib_url()))
+    return urls
+
+
+def is_cached(session, url):
+    """
+    Check whether a record can be served from the local cache without any request.
+    :param session: DBLP session.
+    :param url: URL of record.
+    :return: True iff the record is cached and does not need revalidation.
+    """
+    return session.cache is not None and not session.revalidate and url in session.cache
+
+
+def needed_urls(session, dblp_id, bib_format):
+    """
+    Get URLs of all records which need a request to obtain the bibtex of an entry.
+    :param session: DBLP session.
+    :param dblp_id: DBLP id.
+    :param bib_format: Bibtex format of DBLP.
+    :return: List of URLs. Empty if the bibtex is locked or all records are cached.
+    """
+    if session.lock is not None and (session.lock.frozen or session.lock.get(dblp_id, bib_format) is not None):
+        # Locked records (or missing records in a frozen lock) need no requests
+        return []
+    return [url for url in record_urls(session, dblp_id, bib_format) if not is_cached(session, url)]
+
+
+def plan_conversion(session, bib, bib_format):
+    """
+    Plan the conversion of a bibliography (see database.convert_dblp_entries).
+    :param session: DBLP session.
+    :param bib: Bibliography in pybtex format.
+    :param bib_format: Bibtex format of DBLP.
+    :return: Plan.
+    """
+    plan = Plan(session, bib_format)
+    for entry in bib.entries.values():
+        dblp_id = dblp_api.extract_dblp_id(entry)
+        if dblp_id is None:
+            continue
+        plan.entries += 1
+        for fmt in BibFormat:
+            needed = len(needed_urls(session, dblp_id, fmt))
+            plan.add_requests(needed, bib_format=fmt)
+            if fmt is bib_format and needed == 0:
+                plan.cache_hits += 1
+    return plan
+
+
+def plan_update(session, bib, bib_format, use_doi=True, doi_batch_size=10):
+    """
+    Plan the update of a bibliography from DBLP (see bin/update_from_dblp.py).
+    Each entry without DBLP id needs one or two searches and one fetch if a match is found.
+    Entries with DOI are resolved by batched searches instead. If a DOI is not found, the entry is searched as well.
+    :param session: DBLP session.
+    :param bib: Bibliography in pybtex format.
+    :param bib_format: Bibtex format of DBLP.
+    :param use_doi: Whether entries with DOI are resolved by their DOI first.
+    :param doi_batch_size: Number of DOIs per search query.
+    :return: Plan.
+    """
+    plan = Plan(session, bib_format)
+    doi_index = dblp_api.cached_doi_index(session) if use_doi else dict()
+    dois = []
+    fuzzy_entries = 0
+    for entry in bib.entries.values():
+        if dblp_api.extract_dblp_id(entry) is not None:
+            continue
+        plan.entries += 1
+        if use_doi and "doi" in entry.fields:
+            dois.append(dblp_api.normalize_doi(entry.fields["doi"]))
+        else:
+            fuzzy_entries += 1
+
+    # DOI lookups
+    uncached_dois = [doi for doi in dois if doi not in doi_index]
+    plan.cache_hits += len(dois) - len(uncached_dois)
+    plan.add_requests(math.ceil(len(uncached_dois) / doi_batch_size))
+    for fmt in BibFormat:
+        fetches_per_entry = 2 if fmt is BibFormat.condensed_doi else 1
+        # Fetch of records resolved by DOI. DOIs which are not in the cache might not be found and fall back to the fuzzy search.
+        plan.add_requests(0, fetches_per_entry * (len(dois) - len(uncached_dois)) + (2 + fetches_per_entry) * len(uncached_dois), bib_format=fmt)
+        # Fuzzy search (one or two searches) and fetch
+        plan.add_requests(fuzzy_entries, (2 + fetches_per_entry) * fuzzy_entries, bib_format=fmt)
+    return plan
+
+
+def prioritize_conversion(session, bib, bib_format):
+    """
+    Order the entries of a conversion such that the most valuable entries come first.
+    Entries whose records are cached need no requests and come first, followed by entries needing fewer requests.
+    Entries without DBLP id are omitted as they are not converted.
+    :param session: DBLP session.
+    :param bib: Bibliography in pybtex format.
+    :param bib_format: Bibtex format of DBLP.
+    :return: List of keys.
+    """
+    costs = []
+    for entry_str, entry in bib.entries.items():
+        dblp_id = dblp_api.extract_dblp_id(entry)
+        if dblp_id is not None:
+            costs.append((len(needed_urls(session, dblp_id, bib_format)), entry_str))
+    # Stable sort keeps the order of the bibliography for equal costs
+    costs.sort(key=lambda cost: cost[0])
+    return [entry_str for _, entry_str in costs]
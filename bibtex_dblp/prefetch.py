@@ -0,0 +1,128 @@
+import logging
+import re
+import urllib.parse
+from requests.exceptions import HTTPError
+
+import bibtex_dblp.database
+import bibtex_dblp.dblp_api as dblp_api
+import bibtex_dblp.planner
+import bibtex_dblp.profiling as profiling
+import bibtex_dblp.stats as stats
+from bibtex_dblp.dblp_api import BibFormat
+
+# Minimal number of pending entries of the same venue and year such that fetching a complete table of contents is worthwhile
+MIN_ENTRIES = 4
+
+# Maximal number of records in a table of contents returned by DBLP
+MAX_TOC_RECORDS = 1000
+
+# Venues whose volumes are too large to be fetched at once
+SKIPPED_VENUES = ["journals/corr"]
+
+
+def venue_prefix(dblp_id):
+    """
+    Get venue prefix of DBLP id.
+    :param dblp_id: DBLP id, e.g., 'conf/tacas/JansenKKMVW20'.
+    :return: Venue prefix, e.g., 'conf/tacas'.
+    """
+    return dblp_id.rsplit("/", 1)[0]
+
+
+def toc_of_record(session, dblp_id):
+    """
+    Get the table of contents containing a record.
+    :param session: DBLP session.
+    :param dblp_id: DBLP id of record.
+    :return: Identifier of table of contents, e.g., 'db/conf/tacas/tacas2020-2', or None if the record is not part of a table of contents.
+    """
+    xml = session.get_record("{}/rec/{}.xml".format(session.base_url, dblp_id))
+    match = re.search(r"<url>(db/[^<#]+)\.html", xml)
+    return None if match is None else match.group(1)
+
+
+def fetch_toc(session, toc, bib_format):
+    """
+    Fetch the bibtex of all records in a table of contents with one request.
+    :param session: DBLP session.
+    :param toc: Identifier of table of contents.
+    :param bib_format: Format of bibtex export. The bibtex is not finalized (see dblp_api.finalize_bibtex).
+    :return: Dictionary from DBLP id to the bibtex of its record.
+    """
+    parameters = dict(q="toc:{}.bht:".format(toc), h=MAX_TOC_RECORDS, format="bib" + bib_format.bib_url())
+    text = session.get_record("{}?{}".format(session.publication_search_url, urllib.parse.urlencode(parameters)))
+    entries = dict()
+    for _, start, end in bibtex_dblp.database.split_bibtex(text):
+        key = bibtex_dblp.database.entry_key(text, start)
+        if key is not None and key.startswith("DBLP:"):
+            entries[key] = text[start:end]
+
+    records = dict()
+    for key, bibtex in entries.items():
+        # Records end with an empty line as when fetched separately
+        record = bibtex + "\n\n"
+        if bib_format is BibFormat.crossref:
+            # Add referenced proceedings as in the separate record
+            match = re.search(r"^\s*crossref\s*=\s*\{([^}]*)\}", bibtex, flags=re.MULTILINE)
+            if match and match.group(1) in entries:
+                record += entries[match.group(1)] + "\n\n"
+        records[key[len("DBLP:") :]] = record
+    return records
+
+
+@profiling.phase("prefetch")
+@stats.timed("dblp.prefetch_volumes")
+def prefetch_volumes(session, bib, bib_format=BibFormat.condensed, keys=None, min_entries=MIN_ENTRIES):
+    """
+    Prefetch the bibtex of entries by fetching complete tables of contents (proceedings volumes and journal issues).
+    The entries with DBLP id are grouped by venue and year. For each group with enough entries which are neither cached nor locked,
+    the table of contents of one entry is fetched and all entries contained in it are obtained at once.
+    This is repeated as long as enough entries of the group remain (e.g., for proceedings with multiple volumes).
+    Fetching a table of contents needs one request to determine it and one request per needed format.
+    :param session: DBLP session.
+    :param bib: Bibliography in pybtex format.
+    :param bib_format: Bibtex format of DBLP.
+    :param keys: Keys of the entries to consider. If None, all entries are considered.
+    :param min_entries: Minimal number of entries of a group to fetch its table of contents.
+    :return: Dictionary from DBLP id to bibtex (as returned by dblp_api.get_bibtex).
+    """
+    groups = dict()
+    for key in bib.entries.keys() if keys is None else keys:
+        entry = bib.entries[key]
+        dblp_id = dblp_api.extract_dblp_id(entry)
+        if dblp_id is None or venue_prefix(dblp_id) in SKIPPED_VENUES or not bibtex_dblp.planner.needed_urls(session, dblp_id, bib_format):
+            continue
+        group = groups.setdefault((venue_prefix(dblp_id), entry.fields.get("year")), [])
+        if dblp_id not in group:
+            group.append(dblp_id)
+
+    formats = [bib_format, BibFormat.standard] if bib_format is BibFormat.condensed_doi else [bib_format]
+    prefetched = dict()
+    for (venue, year), pending in groups.items():
+        while len(pending) >= min_entries:
+            try:
+                toc = toc_of_record(session, pending[0])
+                if toc is None:
+                    break
+                logging.debug("Prefetching {} for {} entries".format(toc, len(pending)))
+                records = [fetch_toc(session, toc, fmt) for fmt in formats]
+            except HTTPError as err:
+                logging.warning("Prefetching volume of {} ({}) returned error {}.".format(venue, year, err))
+                break
+            except dblp_api.BudgetExhaustedException as err:
+                logging.warning(str(err) + ". Stopping the prefetching.")
+                return prefetched
+            stats.increment("dblp.prefetch.volumes")
+
+            for dblp_id in pending:
+                if dblp_id in records[0]:
+                    standard_bibtex = records[1].get(dblp_id, "") if len(records) > 1 else None
+                    bibtex = dblp_api.finalize_bibtex(dblp_id, records[0][dblp_id], bib_format=bib_format, standard_bibtex=standard_bibtex)
+                    prefetched[dblp_id] = bibtex
+                    if session.lock is not None:
+                        session.lock.put(dblp_id, bib_format, bibtex)
+                    stats.increment("dblp.prefetch.records")
+            # Always remove the first entry to guarantee progress
+            pending = [dblp_id for dblp_id in pending[1:] if dblp_id not in prefetched]
+    logging.info("Prefetched {} entries".format(len(prefetched)))
+    return prefetched
@@ -0,0 +1,179 @@
+import cProfile
+import sys
+import time
+import tracemalloc
+from contextlib import contextmanager
+
+# Currently active profiler
+_ACTIVE_PROFILER = None
+
+
+class PhaseResult:
+    """
+    Accumulated measurements of one phase.
+    """
+
+    def __init__(self):
+        self.count = 0
+        self.wall_time = 0.0
+        self.cpu_time = 0.0
+        self.peak_memory = None
+
+    def to_json(self):
+        """
+        Get result as JSON-serializable dictionary.
+        :return: Dictionary.
+        """
+        return dict(count=self.count, wall_time=self.wall_time, cpu_time=self.cpu_time, peak_memory=self.peak_memory)
+
+
+class Profiler:
+    """
+    Profiler measuring wall time, CPU time and peak memory of the tagged phases of a run.
+    Phases are tagged with the context manager phase(). Nested phases are measured inclusively.
+    """
+
+    def __init__(self, track_memory=True, cprofile=False):
+        """
+        Create profiler.
+        :param track_memory: Whether to track the peak memory per phase with tracemalloc.
+        :param cprofile: Whether to additionally run cProfile to obtain function level statistics.
+        """
+        self.track_memory = track_memory
+        self.phases = dict()
+        self.profile = cProfile.Profile() if cprofile else None
+        # Peak memory of already finished sub-phases for each currently open phase
+        self._peak_stack = []
+        self._start_wall = None
+        self._start_cpu = None
+        self.wall_time = None
+        self.cpu_time = None
+
+    def start(self):
+        """
+        Start profiling and make this profiler the active one.
+        """
+        global _ACTIVE_PROFILER
+        _ACTIVE_PROFILER = self
+        if self.track_memory and not tracemalloc.is_tracing():
+            tracemalloc.start()
+        if self.profile is not None:
+            self.profile.enable()
+        self._start_wall = time.perf_counter()
+        self._start_cpu = time.process_time()
+
+    def stop(self):
+        """
+        Stop profiling.
+        """
+        global _ACTIVE_PROFILER
+        self.wall_time = time.perf_counter() - self._start_wall
+        self.cpu_time = time.process_time() - self._start_cpu
+        if self.profile is not None:
+            self.profile.disable()
+        if self.track_memory and tracemalloc.is_tracing():
+            tracemalloc.stop()
+        if _ACTIVE_PROFILER is self:
+            _ACTIVE_PROFILER = None
+
+    def __enter__(self):
+        self.start()
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.stop()
+
+    @contextmanager
+    def phase(self, name):
+        """
+        Context manager measuring the enclosed block as part of the given phase.
+        :param name: Name of phase.
+        """
+        tracking = self.track_memory and tracemalloc.is_tracing()
+        if tracking:
+            # Remember peak so far for the enclosing phase and measure the peak of this phase separately
+            if self._peak_stack:
+                self._peak_stack[-1] = max(self._peak_stack[-1], tracemalloc.get_traced_memory()[1])
+            tracemalloc.reset_peak()
+            self._peak_stack.append(0)
+        start_wall = time.perf_counter()
+        start_cpu = time.process_time()
+        try:
+            yield
+        finally:
+            result = self.phases.get(name)
+            if result is None:
+                result = PhaseResult()
+                self.phases[name] = result
+            result.count += 1
+            result.wall_time += time.perf_counter() - start_wall
+            result.cpu_time += time.process_time() - start_cpu
+            if tracking:
+                peak = max(self._peak_stack.pop(), tracemalloc.get_traced_memory()[1])
+                result.peak_memory = peak if result.peak_memory is None else max(result.peak_memory, peak)
+                if self._peak_stack:
+                    self._peak_stack[-1] = max(self._peak_stack[-1], peak)
+
+    def dump_stats(self, file):
+        """
+        Dump cProfile statistics in pstats format.
+        The file can be inspected with pstats or converted into a flamegraph (e.g. with flameprof or snakeviz).
+        :param file: Path of output file.
+        """
+        assert self.profile is not None, "cProfile was not enabled"
+        self.profile.dump_stats(file)
+
+    def to_json(self):
+        """
+        Get profiling results as JSON-serializable dictionary.
+        :return: Dictionary.
+        """
+        return dict(wall_time=self.wall_time, cpu_time=self.cpu_time, phases={name: result.to_json() for name, result in self.phases.items()})
+
+    def __str__(self):
+        lines = ["Profile:"]
+        lines.append("  {:<16} {:>8} {:>10} {:>10} {:>12}".format("phase", "count", "wall [s]", "cpu [s]", "peak [MiB]"))
+        for name, result in self.phases.items():
+            peak = "-" if result.peak_memory is None else "{:.1f}".format(result.peak_memory / 2**20)
+            lines.append("  {:<16} {:>8} {:>10.3f} {:>10.3f} {:>12}".format(name, result.count, result.wall_time, result.cpu_time, peak))
+        if self.wall_time is not None:
+            lines.append("  {:<16} {:>8} {:>10.3f} {:>10.3f}".format("total", "", self.wall_time, self.cpu_time))
+        return "\n".join(lines)
+
+    def finish(self, dump_file=None, file=None):
+        """
+        Stop profiling, print the report and optionally dump the cProfile statistics.
+        :param dump_file: Path for the pstats dump. If None, no dump is written.
+        :param file: File to print to. Default is stderr.
+        """
+        self.stop()
+        print(self, file=sys.stderr if file is None else file)
+        if dump_file is not None:
+            self.dump_stats(dump_file)
+
+
+@contextmanager
+def profile(track_memory=True, cprofile=False):
+    """
+    Context manager profiling the enclosed block.
+    :param track_memory: Whether to track the peak memory per phase with tracemalloc.
+    :param cprofile: Whether to additionally run cProfile.
+    :return: Profiler containing the results.
+    """
+    profiler = Profiler(track_memory=track_memory, cprofile=cprofile)
+    with profiler:
+        yield profiler
+
+
+@contextmanager
+def phase(name):
+    """
+    Context manager tagging the enclosed block as part of the given phase.
+    Does nothing if no profiler is active.
+    :param name: Name of phase, e.g., 'load', 'resolve_ids', 'fetch', 'parse', 'merge' or 'write'.
+    """
+    if _ACTIVE_PROFILER is None:
+        yield
+    else:
+        with _ACTIVE_PROFILER.phase(name):
+            yield
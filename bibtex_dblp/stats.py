@@ -0,0 +1,176 @@
+import json
+import sys
+import threading
+import time
+from contextlib import contextmanager
+
+# Upper bounds (in seconds) of the buckets of latency histograms
+HISTOGRAM_BUCKETS = [0.001, 0.01, 0.1, 0.5, 1, 2, 5, 10, 30, float("inf")]
+
+
+class Timer:
+    """
+    Keeps track of the durations of one kind of operation.
+    """
+
+    def __init__(self):
+        self.count = 0
+        self.total = 0.0
+        self.min = None
+        self.max = None
+        self.histogram = [0] * len(HISTOGRAM_BUCKETS)
+
+    def record(self, seconds):
+        """
+        Record one duration.
+        :param seconds: Duration in seconds.
+        """
+        self.count += 1
+        self.total += seconds
+        self.min = seconds if self.min is None else min(self.min, seconds)
+        self.max = seconds if self.max is None else max(self.max, seconds)
+        for i, bound in enumerate(HISTOGRAM_BUCKETS):
+            if seconds <= bound:
+                self.histogram[i] += 1
+                break
+
+    def to_json(self):
+        """
+        Get timer as JSON-serializable dictionary.
+        :return: Dictionary.
+        """
+        return dict(
+            count=self.count,
+            total=self.total,
+            mean=self.total / self.count if self.count > 0 else 0,
+            min=self.min,
+            max=self.max,
+            histogram={"<={}".format(bound): count for bound, count in zip(HISTOGRAM_BUCKETS, self.histogram) if count > 0},
+        )
+
+
+class Statistics:
+    """
+    Collection of counters and timers.
+    """
+
+    def __init__(self):
+        self.counters = dict()
+        self.timers = dict()
+        self.lock = threading.Lock()
+
+    def increment(self, name, value=1):
+        """
+        Increment counter.
+        :param name: Name of counter.
+        :param value: Value to add.
+        """
+        with self.lock:
+            self.counters[name] = self.counters.get(name, 0) + value
+
+    def record_time(self, name, seconds):
+        """
+        Record duration for timer.
+        :param name: Name of timer.
+        :param seconds: Duration in seconds.
+        """
+        with self.lock:
+            if name not in self.timers:
+                self.timers[name] = Timer()
+            self.timers[name].record(seconds)
+
+    def ratios(self):
+        """
+        Compute hit ratios for all pairs of counters '<name>.hit' and '<name>.miss'.
+        :return: Dictionary from name to hit ratio.
+        """
+        ratios = dict()
+        for name, hits in self.counters.items():
+            if name.endswith(".hit"):
+                prefix = name[:-4]
+                total = hits + self.counters.get(prefix + ".miss", 0)
+                ratios[prefix] = hits / total if total > 0 else 0
+        return ratios
+
+    def to_json(self):
+        """
+        Get statistics as JSON-serializable dictionary.
+        :return: Dictionary.
+        """
+        with self.lock:
+            return dict(
+                counters=dict(sorted(self.counters.items())),
+                timers={name: timer.to_json() for name, timer in sorted(self.timers.items())},
+                ratios=self.ratios(),
+            )
+
+    def __str__(self):
+        data = self.to_json()
+        lines = ["Statistics:"]
+        for name, value in data["counters"].items():
+            lines.append("  {:<32} {:>10}".format(name, value))
+        for name, ratio in data["ratios"].items():
+            lines.append("  {:<32} {:>9.1f}%".format(name + " hit ratio", ratio * 100))
+        for name, timer in data["timers"].items():
+            lines.append(
+                "  {:<32} {:>10} calls, total {:.3f}s, mean {:.3f}s, max {:.3f}s".format(name, timer["count"], timer["total"], timer["mean"], timer["max"])
+            )
+            lines.append("  {:<32} {}".format("", ", ".join("{}: {}".format(bound, count) for bound, count in timer["histogram"].items())))
+        return "\n".join(lines)
+
+
+# Global statistics which are collected during the run
+STATISTICS = Statistics()
+
+
+def increment(name, value=1):
+    """
+    Increment global counter.
+    :param name: Name of counter.
+    :param value: Value to add.
+    """
+    STATISTICS.increment(name, value)
+
+
+def record_time(name, seconds):
+    """
+    Record duration for global timer.
+    :param name: Name of timer.
+    :param seconds: Duration in seconds.
+    """
+    STATISTICS.record_time(name, seconds)
+
+
+@contextmanager
+def timed(name):
+    """
+    Context manager measuring the wall time of the enclosed block for the global timer.
+    :param name: Name of timer.
+    """
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        STATISTICS.record_time(name, time.perf_counter() - start)
+
+
+def reset():
+    """
+    Reset global statistics.
+    """
+    global STATISTICS
+    STATISTICS = Statistics()
+
+
+def print_report(output_format="text", file=None):
+    """
+    Print report of global statistics.
+    :param output_format: Either 'text' for a human-readable report or 'json'.
+    :param file: File to print to. Default is stderr.
+    """
+    if file is None:
+        file = sys.stderr
+    if output_format == "json":
+        print(json.dumps(STATISTICS.to_json(), indent=2), file=file)
+    else:
+        print(STATISTICS, file=file)
@@ -0,0 +1,165 @@
+import collections
+import json
+import logging
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from pybtex.exceptions import PybtexError
+from requests.exceptions import RequestException
+
+import bibtex_dblp.database
+import bibtex_dblp.dblp_api as dblp_api
+import bibtex_dblp.lock
+from bibtex_dblp.dblp_api import BibFormat
+
+# Errors which are reported for a single request without stopping the stream
+# Failed requests (e.g. unreachable host or timeout) raise a RequestException and unsuccessful searches raise an AssertionError.
+REQUEST_ERRORS = (
+    ValueError,
+    AssertionError,
+    RequestException,
+    PybtexError,
+    dblp_api.InvalidDblpIdException,
+    dblp_api.BudgetExhaustedException,
+    bibtex_dblp.lock.RecordNotLockedException,
+)
+
+
+def parse_request(line):
+    """
+    Parse one request of the stream.
+    A request is a JSON object with exactly one of the keys:
+        'query': search DBLP for publications,
+        'dblp_id': get bibtex of DBLP record,
+        'bibtex': convert bibtex entry with DBLP id into the DBLP format (as done by convert_dblp, i.e., the key is kept).
+    Optional keys are 'id' (copied to the result), 'format' (DBLP format) and 'max_results' (for searches).
+    The values of 'query', 'dblp_id', 'bibtex' and 'format' must be strings and 'max_results' must be a positive integer.
+    :param line: Line containing the JSON object.
+    :return: Request as dictionary.
+    :raises: ValueError if the request is invalid.
+    """
+    request = json.loads(line)
+    if not isinstance(request, dict):
+        raise ValueError("Request must be a JSON object")
+    kinds = [kind for kind in ["query", "dblp_id", "bibtex"] if kind in request]
+    if len(kinds) != 1:
+        raise ValueError("Request must contain exactly one of 'query', 'dblp_id' or 'bibtex'")
+    if not isinstance(request[kinds[0]], str):
+        raise ValueError("Value of '{}' must be a string".format(kinds[0]))
+    if "format" in request and not isinstance(request["format"], str):
+        raise ValueError("Value of 'format' must be a string")
+    if "max_results" in request:
+        # bool is a subclass of int but no valid number
+        max_results = request["max_results"]
+        if not isinstance(max_results, int) or isinstance(max_results, bool) or max_results <= 0:
+            raise ValueError("Value of 'max_results' must be a positive integer")
+    return request
+
+
+def process_request(session, request, bib_format=BibFormat.condensed, max_search_results=30):
+    """
+    Process one request.
+    :param session: DBLP session.
+    :param request: Request as dictionary (see parse_request).
+    :param bib_format: Default bibtex format of DBLP.
+    :param max_search_results: Default maximal number of search results.
+    :return: Result as JSON-serializable dictionary.
+    """
+    bib_format = BibFormat(request["format"]) if "format" in request else bib_format
+    if "query" in request:
+        search_results = dblp_api.search_publication(session, request["query"], max_search_results=request.get("max_results", max_search_results))
+        return dict(query=request["query"], total_matches=search_results.total_matches, results=[result.to_json() for result in search_results.results])
+    if "dblp_id" in request:
+        return dict(dblp_id=request["dblp_id"], bibtex=dblp_api.get_bibtex(session, request["dblp_id"], bib_format=bib_format))
+
+    bib = bibtex_dblp.database.parse_bibtex(request["bibtex"])
+    if len(bib.entries) != 1:
+        raise ValueError("Bibtex must contain exactly one entry but contains {}".format(len(bib.entries)))
+    key, entry = next(iter(bib.entries.items()))
+    dblp_id = dblp_api.extract_dblp_id(entry)
+    if dblp_id is None:
+        # Nothing to convert
+        return dict(key=key, dblp_id=None, bibtex=request["bibtex"])
+    # Fetch first such that errors are reported (convert_dblp_entries skips entries which cannot be fetched)
+    prefetched = {dblp_id: dblp_api.get_bibtex(session, dblp_id, bib_format=bib_format)}
+    # The conversion keeps the key of the entry
+    bib, _ = bibtex_dblp.database.convert_dblp_entries(session, bib, bib_format=bib_format, prefetched=prefetched)
+    return dict(key=key, dblp_id=dblp_id, bibtex=bib.to_string("bibtex"))
+
+
+def _process_line(session, line_no, line, bib_format, max_search_results):
+    """
+    Parse and process one line of the stream.
+    :return: Result as dictionary. Errors are reported in the result.
+    """
+    result = dict(line=line_no)
+    try:
+        request = parse_request(line)
+        if "id" in request:
+            result["id"] = request["id"]
+        result.update(process_request(session, request, bib_format=bib_format, max_search_results=max_search_results))
+    except REQUEST_ERRORS as err:
+        result["error"] = str(err)
+    except TypeError as err:
+        # Safety net for malformed requests which are not detected by parse_request
+        logging.debug("Unexpected type in request in line {}".format(line_no), exc_info=True)
+        result["error"] = str(err)
+    return result
+
+
+def stream_requests(session, lines, output, bib_format=BibFormat.condensed, max_search_results=30, workers=4, window=None, ordered=False):
+    """
+    Process a stream of JSONL requests and write one JSON result per line as soon as it is available.
+    At most 'window' requests are in progress at the same time. New lines are only read when a request is finished,
+    so the memory is bounded and a slow consumer slows down the reading (backpressure).
+    Each result contains the line number of its request ('line') and the given 'id'. Failed requests contain the key 'error'.
+    :param session: DBLP session. The rate limiting is shared by all workers.
+    :param lines: Iterable of input lines, e.g., sys.stdin.
+    :param output: Output stream, e.g., sys.stdout. It is flushed after each result.
+    :param bib_format: Default bibtex format of DBLP.
+    :param max_search_results: Default maximal number of search results.
+    :param workers: Number of concurrent workers.
+    :param window: Maximal number of requests in progress. If None, twice the number of workers is used.
+    :param ordered: Whether results are written in the order of the requests. Otherwise, results are written as soon as they are finished.
+    :return: Tuple (number of results, number of errors).
+    """
+    if window is None:
+        window = 2 * workers
+    pending = collections.deque()
+    no_results = 0
+    no_errors = 0
+
+    def emit(future):
+        nonlocal no_results, no_errors
+        result = future.result()
+        no_results += 1
+        if "error" in result:
+            no_errors += 1
+            logging.debug("Request in line {} failed: {}".format(result["line"], result["error"]))
+        output.write(json.dumps(result) + "\n")
+        output.flush()
+
+    def drain(block):
+        # Write finished results. If block is set, wait until at least one result is written.
+        if ordered:
+            while pending and (pending[0].done() or block):
+                emit(pending.popleft())
+                block = False
+        else:
+            done, _ = wait(pending, timeout=None if block else 0, return_when=FIRST_COMPLETED)
+            for future in [future for future in pending if future in done]:
+                pending.remove(future)
+                emit(future)
+
+    executor = ThreadPoolExecutor(max_workers=workers)
+    try:
+        for line_no, line in enumerate(lines, start=1):
+            if not line.strip():
+                continue
+            while len(pending) >= window:
+                drain(block=True)
+            pending.append(executor.submit(_process_line, session, line_no, line, bib_format, max_search_results))
+            drain(block=False)
+        while pending:
+            drain(block=True)
+    finally:
+        executor.shutdown(wait=True, cancel_futures=True)
+    return no_results, no_errors
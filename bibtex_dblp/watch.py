@@ -0,0 +1,310 @@
+import hashlib
+import logging
+import pybtex.database
+import pybtex.io
+import re
+import time
+from pathlib import Path
+from pybtex.exceptions import PybtexError
+from requests.exceptions import HTTPError
+
+import bibtex_dblp.database
+import bibtex_dblp.dblp_api as dblp_api
+
+
+class FileWatcher:
+    """
+    Detects changes of files by polling their modification time and size.
+    Polling only needs one stat() call per file and works on all platforms and file systems.
+    """
+
+    def __init__(self, paths):
+        """
+        Create watcher. The current state of the files is taken as reference.
+        :param paths: List of paths of files to watch. The files do not need to exist.
+        """
+        self.paths = [Path(path) for path in paths]
+        self.state = None
+        self.snapshot()
+
+    @staticmethod
+    def file_state(path):
+        """
+        Get the state of a file.
+        :param path: Path of file.
+        :return: Tuple (modification time, size) or None if the file does not exist.
+        """
+        try:
+            stat = Path(path).stat()
+            return stat.st_mtime_ns, stat.st_size
+        except FileNotFoundError:
+            return None
+
+    def _current_state(self):
+        return [self.file_state(path) for path in self.paths]
+
+    def snapshot(self, path=None, state=None):
+        """
+        Take the current state of the files as reference.
+        :param path: If given, only the reference of this file is updated.
+        :param state: State of the given file (see file_state). If None, the current state is used.
+        """
+        if path is None:
+            self.state = self._current_state()
+            return
+        index = self.paths.index(Path(path))
+        self.state[index] = self.file_state(path) if state is None else state
+
+    def changed(self):
+        """
+        Check whether the files changed since the last snapshot.
+        :return: True iff at least one file changed.
+        """
+        return self._current_state() != self.state
+
+    def wait(self, interval=1.0, timeout=None):
+        """
+        Wait until the files changed since the last snapshot.
+        As editors and scripts often write files in multiple steps, the method only returns after the files were unchanged for one interval.
+        :param interval: Time in seconds between two checks.
+        :param timeout: Maximal time in seconds to wait. If None, wait forever.
+        :return: True if the files changed, False if the timeout was reached.
+        """
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while not self.changed():
+            if deadline is not None and time.monotonic() >= deadline:
+                return False
+            time.sleep(interval)
+        # Wait until the files are stable
+        state = self._current_state()
+        while True:
+            time.sleep(interval)
+            current = self._current_state()
+            if current == state:
+                return True
+            state = current
+
+
+def read_citations(aux_file):
+    """
+    Read the cited keys from a LaTeX .aux file.
+    Both \\citation{...} of bibtex and \\abx@aux@cite{...} of biblatex are supported. Included .aux files are read as well.
+    :param aux_file: Path of .aux file.
+    :return: Set of cited keys or None if all entries are cited (\\nocite{*}).
+    """
+    aux_file = Path(aux_file)
+    citations = set()
+    try:
+        content = aux_file.read_text(encoding="utf-8", errors="replace")
+    except FileNotFoundError:
+        logging.debug("Aux file {} does not exist (yet)".format(aux_file))
+        return citations
+    for match in _CITATION.finditer(content):
+        citations.update(key.strip() for key in match.group(1).split(","))
+    for match in _INPUT.finditer(content):
+        included = read_citations(aux_file.parent / match.group(1))
+        if included is None:
+            return None
+        citations.update(included)
+    if "*" in citations:
+        return None
+    return citations
+
+
+_CITATION = re.compile(r"\\(?:citation|abx@aux@cite(?:\{[^}]*\})?)\{([^}]*)\}")
+_INPUT = re.compile(r"\\@input\{([^}]*)\}")
+
+
+class IncrementalConverter:
+    """
+    Conversion of a bibliography which is repeated whenever the input changes.
+    The parsed and converted entries are kept between conversions and each entry is identified by a fingerprint of its bibtex.
+    Only entries which were added or edited since the last conversion are parsed and converted again.
+    """
+
+    def __init__(self, session, infile, outfile, bib_format=dblp_api.BibFormat.condensed, aux_file=None, processes=1):
+        """
+        Create converter.
+        :param session: DBLP session. The session (and its rate limiting) is reused for all conversions.
+        :param infile: Path of input bibtex file.
+        :param outfile: Path of output bibtex file. Can be the same as the input file.
+        :param bib_format: Bibtex format of DBLP.
+        :param aux_file: Path of LaTeX .aux file. If given, only cited entries are converted.
+        :param processes: Number of processes used for parsing the complete bibtex file.
+        """
+        self.session = session
+        self.infile = Path(infile)
+        self.outfile = Path(outfile)
+        self.bib_format = bib_format
+        self.aux_file = None if aux_file is None else Path(aux_file)
+        self.processes = processes
+        self.watcher = FileWatcher([self.infile] if self.aux_file is None else [self.infile, self.aux_file])
+
+        self.bib = None
+        # Fingerprint of all @string and @preamble commands
+        self.header = None
+        # Fingerprint of the bibtex of each entry in the input file
+        self.fingerprints = dict()
+        # Keys of entries which were already converted (or do not need a conversion)
+        self.converted = set()
+        # Number of converted entries which are not written yet
+        self.unwritten = 0
+        # Keys of entries which were added by the conversion, e.g., proceedings for the format 'crossref'
+        self.added = set()
+
+    def _read_input(self):
+        """
+        Read the input file and compute the fingerprints.
+        :return: Input text, header text, list of tuples (key, fingerprint, bibtex) for all entries.
+        """
+        with pybtex.io.open_unicode(self.infile) as f:
+            text = f.read()
+        return self._split_input(text)
+
+    @staticmethod
+    def _split_input(text):
+        """
+        Split bibtex string into entries and compute the fingerprints.
+        :param text: Bibtex string.
+        :return: Text, header text, list of tuples (key, fingerprint, bibtex) for all entries.
+        """
+        header = ""
+        entries = []
+        for command, start, end in bibtex_dblp.database.split_bibtex(text):
+            if command.lower() in ["string", "preamble"]:
+                header += text[start:end] + "\n"
+                continue
+            key = bibtex_dblp.database.entry_key(text, start)
+            if key is None:
+                # Invalid entry -> let the parser report the error
+                entries.append((None, None, text[start:end]))
+            else:
+                entries.append((key, hashlib.sha256(text[start:end].encode("utf-8")).hexdigest(), text[start:end]))
+        return text, header, entries
+
+    def reload(self):
+        """
+        Read the input file and update the bibliography.
+        Only entries with a changed fingerprint are parsed. If the @string or @preamble commands changed, the complete file is parsed.
+        :return: Number of added, edited or removed entries.
+        :raises: PybtexError if the bibtex of a changed entry is invalid.
+        """
+        text, header, entries = self._read_input()
+        full = self.bib is None or header != self.header
+        if full:
+            changed = entries
+            parsed = bibtex_dblp.database.parse_bibtex_parallel(text, processes=self.processes)
+        else:
+            changed = [(key, fingerprint, bibtex) for key, fingerprint, bibtex in entries if key is None or self.fingerprints.get(key) != fingerprint]
+            changed_text = "".join(bibtex + "\n" for _, _, bibtex in changed)
+            parsed = bibtex_dblp.database.parse_bibtex(header + changed_text) if changed else pybtex.database.BibliographyData()
+
+        # Rebuild bibliography in the order of the input file
+        bib = pybtex.database.BibliographyData(preamble=parsed.preamble_list if full else self.bib.preamble_list)
+        for key, _, _ in entries:
+            if key is None:
+                continue
+            if key in parsed.entries:
+                bib.entries[key] = parsed.entries[key]
+                self.converted.discard(key)
+            elif key in self.bib.entries:
+                bib.entries[key] = self.bib.entries[key]
+        for key in self.added:
+            if key not in bib.entries and key in self.bib.entries:
+                bib.entries[key] = self.bib.entries[key]
+        no_removed = 0 if full else len([key for key in self.fingerprints if key not in bib.entries])
+
+        self.bib = bib
+        self.header = header
+        self.fingerprints = {key: fingerprint for key, fingerprint, _ in entries if key is not None}
+        # Added entries which are now contained in the input are treated as ordinary entries
+        self.added = {key for key in self.added if key not in self.fingerprints}
+        return len(changed) + no_removed
+
+    def convert(self):
+        """
+        Convert all entries which were not converted yet.
+        If an .aux file is given, only cited entries are converted.
+        :return: Number of changed entries.
+        """
+        citations = None if self.aux_file is None else read_citations(self.aux_file)
+        keys = [key for key in self.bib.entries.keys() if key not in self.converted and (citations is None or key in citations)]
+        if not keys:
+            return 0
+        logging.debug("Converting {} entries".format(len(keys)))
+        previous_keys = set(self.bib.entries.keys())
+        processed = set()
+        try:
+            # Entries are converted in place, so converted entries are kept even if an error occurs
+            bibtex_dblp.database.convert_dblp_entries(self.session, self.bib, bib_format=self.bib_format, keys=keys, processed=processed)
+        finally:
+            # Only entries which were actually converted are not converted again
+            self.converted.update(processed)
+            new_keys = [key for key in self.bib.entries.keys() if key not in previous_keys]
+            self.added.update(new_keys)
+            self.converted.update(new_keys)
+            no_changes = sum(1 for key in processed if dblp_api.extract_dblp_id(self.bib.entries[key]) is not None) + len(new_keys)
+            self.unwritten += no_changes
+        return no_changes
+
+    def update(self):
+        """
+        Reload the input, convert new and edited entries and write the result.
+        The output file is only written if something changed. If the output file is the input file
+        and the input changed in the meantime, nothing is written and the new input is processed with the next update.
+        :return: Number of changed entries in the output.
+        """
+        self.watcher.snapshot()
+        no_input_changes = self.reload()
+        self.convert()
+        lock = self.session.lock
+        if lock is not None and not lock.frozen and lock.changed:
+            lock.save()
+        # Entries converted by a previous (failed or postponed) update are written as well
+        no_changes = self.unwritten
+        in_place = self.outfile.resolve() == self.infile.resolve()
+        if no_changes == 0 and (in_place or no_input_changes == 0):
+            return 0
+        # If the input changed during the conversion, the input is not overwritten. The check is done directly before replacing the file.
+        written = bibtex_dblp.database.write_to_file(self.bib, self.outfile, check=(lambda: not self.watcher.changed()) if in_place else None)
+        if written is None:
+            logging.info("Input changed during the conversion. Postponing the write.")
+            return 0
+        self.unwritten = 0
+        logging.info("Updated {} entries. Written to {}".format(no_changes, self.outfile))
+        if in_place:
+            # Own changes should not trigger a new update. The fingerprints are computed from the written content (and not from the file),
+            # so edits made after the write are detected as changes.
+            _, self.header, entries = self._split_input(written)
+            self.fingerprints = {key: fingerprint for key, fingerprint, _ in entries if key is not None}
+            state = self.watcher.file_state(self.infile)
+            with pybtex.io.open_unicode(self.infile) as f:
+                unchanged = f.read() == written
+            if unchanged and self.watcher.file_state(self.infile) == state:
+                self.watcher.snapshot(self.infile, state)
+            else:
+                logging.info("Input changed after the write")
+        return no_changes
+
+    def watch(self, interval=1.0, max_updates=None):
+        """
+        Convert the bibliography and keep converting it whenever the input (or the .aux file) changes.
+        Errors (e.g. invalid bibtex while the file is being edited) are reported and the next change is awaited.
+        Only KeyboardInterrupt (and other exceptions not derived from Exception) stop the watcher.
+        :param interval: Time in seconds between two checks for changes.
+        :param max_updates: Maximal number of updates after the initial conversion. If None, watch forever.
+        """
+        updates = 0
+        while True:
+            try:
+                self.update()
+            except (PybtexError, HTTPError, OSError) as err:
+                logging.warning("Conversion failed: {}. Waiting for the next change.".format(err))
+            except Exception:
+                # E.g. unexpected records of DBLP -> the watcher should keep running
+                logging.exception("Conversion failed unexpectedly. Waiting for the next change.")
+            if max_updates is not None and updates >= max_updates:
+                return
+            logging.info("Watching {} for changes".format(", ".join(str(path) for path in self.watcher.paths)))
+            self.watcher.wait(interval)
+            updates += 1
@@ -4,11 +4,21 @@ Convert DBLP entries in a given bibliography according to the specific DBLP form
 """
 
 import argparse
+import atexit
 import logging
+import sys
 from pathlib import Path
 
 import bibtex_dblp.database
-from bibtex_dblp.dblp_api import BibFormat, DblpSession
+import bibtex_dblp.dblp_api
+import bibtex_dblp.dedup
+import bibtex_dblp.lock
+import bibtex_dblp.planner
+import bibtex_dblp.prefetch
+import bibtex_dblp.profiling
+import bibtex_dblp.stats
+import bibtex_dblp.watch
+from bibtex_dblp.dblp_api import BibFormat, DblpSession, RequestBudget
 
 
 def main():
@@ -18,18 +28,107 @@ def main():
     parser.add_argument("--out", "-o", help="Output bibtex file. If no output file is given, the input file will be overwritten.", type=Path, default=None)
     parser.add_argument("--format", "-f", help="DBLP format type to convert into", type=BibFormat, choices=list(BibFormat), default=BibFormat.condensed)
     parser.add_argument("--sleep-time", "-t", help="Sleep time (in seconds) between requests. Can prevent errors with too many requests)", type=int, default=5)
+    parser.add_argument("--cache", help="Directory for storing fetched DBLP records locally", type=Path, default=None)
+    parser.add_argument("--refresh", help="Revalidate cached DBLP records with conditional requests", action="store_true")
+    parser.add_argument("--prefetch", help="Fetch complete volumes at once if many entries belong to the same volume", action="store_true")
+    parser.add_argument("--lock", help="Lockfile pinning the DBLP records (default: INFILE.dblp-lock). Used without requests if it exists.", type=Path)
+    parser.add_argument("--update-lock", help="Fetch new (and stale) records from DBLP and add them to the lockfile", action="store_true")
+    parser.add_argument("--lock-max-age", help="Age (in days) after which locked records are fetched again by --update-lock", type=float, default=None)
+    parser.add_argument("--watch", "-w", help="Keep running and convert new or edited entries whenever the input changes", action="store_true")
+    parser.add_argument("--watch-interval", help="Time (in seconds) between two checks for changes in watch mode", type=float, default=1.0)
+    parser.add_argument("--aux", help="LaTeX .aux file. Only cited entries are converted.", type=Path, default=None)
+    parser.add_argument("--plan", help="Only print the expected number of requests and time without converting", action="store_true")
+    parser.add_argument("--max-requests", help="Maximal number of requests to DBLP. Stops the conversion afterwards.", type=int, default=None)
+    parser.add_argument("--time-budget", help="Maximal time (in seconds) for requests to DBLP. Stops the conversion afterwards.", type=float, default=None)
+    parser.add_argument("--processes", "-j", help="Number of processes used for parsing the bibtex file (0 uses all CPUs).", type=int, default=1)
+    parser.add_argument("--merge-duplicates", help="Merge near-duplicate entries (same authors and title) before processing.", action="store_true")
+    parser.add_argument(
+        "--overwrite", help="Allow overwriting the input file with --merge-duplicates (citations of removed keys must be updated)", action="store_true"
+    )
+    parser.add_argument("--stats", help="Print runtime statistics at the end", action="store_true")
+    parser.add_argument("--stats-format", help="Format of the runtime statistics", choices=["text", "json"], default="text")
+    parser.add_argument("--profile", help="Print wall time, CPU time and peak memory per phase at the end", action="store_true")
+    parser.add_argument("--profile-dump", help="Write cProfile statistics in pstats format to the given file", type=Path, default=None)
 
     parser.add_argument("--verbose", "-v", help="print more output", action="store_true")
     args = parser.parse_args()
+    if args.merge_duplicates and args.out is None and not args.overwrite:
+        parser.error("--merge-duplicates removes cite keys. Use --out to write to another file or --overwrite to overwrite the input file.")
+    if args.watch:
+        unsupported = [option for option, used in [("--plan", args.plan), ("--merge-duplicates", args.merge_duplicates), ("--prefetch", args.prefetch)] if used]
+        if unsupported:
+            parser.error("{} cannot be used together with --watch".format(", ".join(unsupported)))
 
     logging.basicConfig(format="%(levelname)s: %(message)s", level=logging.DEBUG if args.verbose else logging.INFO)
+    if args.stats:
+        atexit.register(bibtex_dblp.stats.print_report, args.stats_format)
+    if args.profile or args.profile_dump:
+        profiler = bibtex_dblp.profiling.Profiler(cprofile=args.profile_dump is not None)
+        profiler.start()
+        atexit.register(profiler.finish, args.profile_dump)
 
     outfile = args.infile if args.out is None else args.out
 
-    bib = bibtex_dblp.database.load_from_file(args.infile)
-    session = DblpSession(wait_time=args.sleep_time)
-    bib, no_changes = bibtex_dblp.database.convert_dblp_entries(session, bib, bib_format=args.format)
+    budget = None
+    if args.max_requests is not None or args.time_budget is not None:
+        budget = RequestBudget(max_requests=args.max_requests, time_budget=args.time_budget)
+    lock_file = args.infile.with_name(args.infile.name + ".dblp-lock") if args.lock is None else args.lock
+    lock = None
+    if args.update_lock or lock_file.exists():
+        lock = bibtex_dblp.lock.RecordLock(lock_file, frozen=not args.update_lock, max_age=args.lock_max_age)
+        logging.info("Using lockfile {}{}".format(lock_file, "" if lock.frozen else " (updating)"))
+        if lock.frozen and lock.max_age is not None:
+            logging.warning("Option --lock-max-age is only used together with --update-lock")
+    session = DblpSession(wait_time=args.sleep_time, cache_dir=args.cache, revalidate=args.refresh, budget=budget, lock=lock)
+
+    if args.watch:
+        # The converter keeps the session and the parsed bibliography between changes
+        converter = bibtex_dblp.watch.IncrementalConverter(
+            session, args.infile, outfile, bib_format=args.format, aux_file=args.aux, processes=args.processes or None
+        )
+        try:
+            converter.watch(interval=args.watch_interval)
+        except KeyboardInterrupt:
+            logging.info("Stopped watching")
+        return
+
+    bib = bibtex_dblp.database.load_from_file(args.infile, processes=args.processes or None)
+    if args.merge_duplicates:
+        clusters = bibtex_dblp.dedup.find_duplicates(bib)
+        bib, removed = bibtex_dblp.dedup.merge_duplicates(bib, clusters)
+        if removed:
+            logging.warning("Merged {} duplicate entries. Update the citations of the removed keys in the LaTeX sources.".format(len(removed)))
+    if args.plan:
+        print(bibtex_dblp.planner.plan_conversion(session, bib, bib_format=args.format))
+        return
+
+    # With a budget, entries needing the fewest requests are converted first
+    keys = None if budget is None else bibtex_dblp.planner.prioritize_conversion(session, bib, bib_format=args.format)
+    if args.aux is not None:
+        citations = bibtex_dblp.watch.read_citations(args.aux)
+        if citations is not None:
+            keys = [key for key in (bib.entries.keys() if keys is None else keys) if key in citations]
+    dblp_ids = [bibtex_dblp.dblp_api.extract_dblp_id(bib.entries[key]) for key in (bib.entries.keys() if keys is None else keys)]
+    dblp_ids = [dblp_id for dblp_id in dblp_ids if dblp_id is not None]
+    if lock is not None and lock.frozen:
+        missing = lock.missing(dblp_ids, args.format)
+        if missing:
+            logging.error("The following records are not contained in lockfile {}. Run with --update-lock to add them.".format(lock_file))
+            for dblp_id in missing:
+                logging.error("- {}".format(dblp_id))
+            sys.exit(1)
+
+    prefetched = None
+    if args.prefetch:
+        prefetched = bibtex_dblp.prefetch.prefetch_volumes(session, bib, bib_format=args.format, keys=keys)
+    bib, no_changes = bibtex_dblp.database.convert_dblp_entries(session, bib, bib_format=args.format, keys=keys, prefetched=prefetched)
     logging.info("Updated {} entries (out of {}) from DBLP".format(no_changes, len(bib.entries)))
+    if lock is not None and not lock.frozen:
+        if keys is None:
+            # Only keep records which are still used
+            lock.prune(dblp_ids)
+        lock.save()
+        logging.info("Written lockfile {}".format(lock_file))
     bibtex_dblp.database.write_to_file(bib, outfile)
     logging.info("Written to {}".format(outfile))
 
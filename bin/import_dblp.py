@@ -4,16 +4,75 @@ Import entry from DBLP according to given search input.
 """
 
 import argparse
+import atexit
+import json
 import logging
 import pyperclip
+import sys
 from pathlib import Path
 
+import bibtex_dblp.batch
 import bibtex_dblp.database
 import bibtex_dblp.dblp_api
 import bibtex_dblp.io
+import bibtex_dblp.profiling
+import bibtex_dblp.stats
 from bibtex_dblp.dblp_api import BibFormat, DblpSession
 
 
+def import_batch(args, bib):
+    """
+    Import publications for all queries given in a file without user interaction.
+    :param args: Command line arguments.
+    :param bib: Bibliography in pybtex format or None.
+    """
+    input_format = args.batch_format
+    if input_format is None:
+        suffix = args.batch.suffix.lower() if args.batch != Path("-") else ""
+        input_format = {".csv": "csv", ".jsonl": "jsonl"}.get(suffix, "lines")
+    if args.batch == Path("-"):
+        queries = bibtex_dblp.batch.read_queries(sys.stdin, input_format)
+    else:
+        with open(args.batch, newline="") as f:
+            queries = bibtex_dblp.batch.read_queries(f, input_format)
+    logging.info("Read {} queries from {}".format(len(queries), args.batch))
+
+    session = DblpSession(wait_time=args.sleep_time, cache_dir=args.cache, revalidate=args.refresh)
+    results = bibtex_dblp.batch.import_queries(
+        session, queries, bib=bib, bib_format=args.format, max_search_results=args.max_results, min_score=args.min_score, workers=args.workers
+    )
+
+    # Write all imported entries at once
+    pub_bibtex = "".join(result.bibtex for result in results if result.status == bibtex_dblp.batch.BatchResult.IMPORTED)
+    if args.bib:
+        with open(args.bib, "a") as f:
+            f.write(pub_bibtex)
+        logging.info("Bibtex file appended to {}.".format(args.bib))
+    else:
+        print(pub_bibtex, end="")
+
+    # Remaining queries need manual review
+    review = [result for result in results if result.status not in [bibtex_dblp.batch.BatchResult.IMPORTED, bibtex_dblp.batch.BatchResult.PRESENT]]
+    if review and args.review:
+        with open(args.review, "w") as f:
+            for result in review:
+                candidates = [dict(key=publication.key, description=str(publication)) for publication in result.candidates]
+                f.write(json.dumps(dict(query=result.query, status=result.status, message=result.message, candidates=candidates)) + "\n")
+        logging.info("Written {} queries for review to {}".format(len(review), args.review))
+    else:
+        for result in review:
+            logging.info("Query '{}' needs review: {}".format(result.query, result.status))
+
+    for status in [
+        bibtex_dblp.batch.BatchResult.IMPORTED,
+        bibtex_dblp.batch.BatchResult.PRESENT,
+        bibtex_dblp.batch.BatchResult.AMBIGUOUS,
+        bibtex_dblp.batch.BatchResult.NOT_FOUND,
+        bibtex_dblp.batch.BatchResult.ERROR,
+    ]:
+        logging.info("{}: {}".format(status, sum(1 for result in results if result.status == status)))
+
+
 def main():
     parser = argparse.ArgumentParser(description="Import entry from DBLP according to given search input from cli.")
 
@@ -30,17 +89,45 @@ def main():
     parser.add_argument("--format", "-f", help="DBLP format type to convert into.", type=BibFormat, choices=list(BibFormat), default=BibFormat.condensed)
     parser.add_argument("--max-results", help="Maximal number of search results to display.", type=int, default=30)
     parser.add_argument("--sleep-time", "-t", help="Sleep time (in seconds) between requests. Can prevent errors with too many requests)", type=int, default=5)
+    parser.add_argument(
+        "--batch",
+        help="Import all queries from the given file ('-' for stdin) without user interaction. Confident matches are selected automatically.",
+        type=Path,
+    )
+    parser.add_argument(
+        "--batch-format", help="Format of batch file. Default is guessed from the file suffix.", choices=["lines", "csv", "jsonl"], default=None
+    )
+    parser.add_argument("--review", help="JSONL file where queries without confident match are written to in batch mode.", type=Path, default=None)
+    parser.add_argument("--min-score", help="Minimal search score for automatic selection in batch mode.", type=float, default=0.9)
+    parser.add_argument("--workers", help="Number of concurrent searches in batch mode.", type=int, default=4)
+    parser.add_argument("--cache", help="Directory for storing fetched DBLP records locally", type=Path, default=None)
+    parser.add_argument("--refresh", help="Revalidate cached DBLP records with conditional requests", action="store_true")
+    parser.add_argument("--processes", "-j", help="Number of processes used for parsing the bibtex file (0 uses all CPUs).", type=int, default=1)
+    parser.add_argument("--stats", help="Print runtime statistics at the end", action="store_true")
+    parser.add_argument("--stats-format", help="Format of the runtime statistics", choices=["text", "json"], default="text")
+    parser.add_argument("--profile", help="Print wall time, CPU time and peak memory per phase at the end", action="store_true")
+    parser.add_argument("--profile-dump", help="Write cProfile statistics in pstats format to the given file", type=Path, default=None)
 
     parser.add_argument("--verbose", "-v", help="print more output", action="store_true")
     args = parser.parse_args()
 
     logging.basicConfig(format="%(levelname)s: %(message)s", level=logging.DEBUG if args.verbose else logging.INFO)
+    if args.stats:
+        atexit.register(bibtex_dblp.stats.print_report, args.stats_format)
+    if args.profile or args.profile_dump:
+        profiler = bibtex_dblp.profiling.Profiler(cprofile=args.profile_dump is not None)
+        profiler.start()
+        atexit.register(profiler.finish, args.profile_dump)
     max_search_results = args.max_results
 
     bib = None
     if args.bib is not None:
         # Load bibliography
-        bib = bibtex_dblp.database.load_from_file(args.bib)
+        bib = bibtex_dblp.database.load_from_file(args.bib, processes=args.processes or None)
+
+    if args.batch is not None:
+        import_batch(args, bib)
+        return
 
     if args.query:
         search_words = args.query
@@ -66,7 +153,7 @@ def main():
                 logging.info("Copied cite key '{}' to clipboard.".format(selected_entry.key))
                 exit(0)
 
-    session = DblpSession(wait_time=args.sleep_time)
+    session = DblpSession(wait_time=args.sleep_time, cache_dir=args.cache, revalidate=args.refresh)
     search_results = bibtex_dblp.dblp_api.search_publication(session, search_words, max_search_results=max_search_results)
     if search_results.total_matches == 0:
         print("The search returned no matches.")
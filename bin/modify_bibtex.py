@@ -4,11 +4,15 @@ Apply modifications on the bibtex entries.
 """
 
 import argparse
+import atexit
 import logging
 from pathlib import Path
 import re
 
 import bibtex_dblp.database
+import bibtex_dblp.dedup
+import bibtex_dblp.profiling
+import bibtex_dblp.stats
 
 
 def main():
@@ -20,15 +24,41 @@ def main():
     parser.add_argument("--no-timestamp", help="Remove timestamp field (if present)", action="store_true")
     parser.add_argument("--no-biburl", help="Remove biburl field (if present)", action="store_true")
     parser.add_argument("--no-bibsource", help="Remove bibsource field (if present)", action="store_true")
+    parser.add_argument("--processes", "-j", help="Number of processes used for parsing the bibtex file (0 uses all CPUs).", type=int, default=1)
+    parser.add_argument("--report-duplicates", help="Report near-duplicate entries (same authors and title)", action="store_true")
+    parser.add_argument("--merge-duplicates", help="Merge near-duplicate entries (same authors and title)", action="store_true")
+    parser.add_argument(
+        "--overwrite", help="Allow overwriting the input file with --merge-duplicates (citations of removed keys must be updated)", action="store_true"
+    )
+    parser.add_argument("--stats", help="Print runtime statistics at the end", action="store_true")
+    parser.add_argument("--stats-format", help="Format of the runtime statistics", choices=["text", "json"], default="text")
+    parser.add_argument("--profile", help="Print wall time, CPU time and peak memory per phase at the end", action="store_true")
+    parser.add_argument("--profile-dump", help="Write cProfile statistics in pstats format to the given file", type=Path, default=None)
 
     parser.add_argument("--verbose", "-v", help="print more output", action="store_true")
     args = parser.parse_args()
+    if args.merge_duplicates and args.out is None and not args.overwrite:
+        parser.error("--merge-duplicates removes cite keys. Use --out to write to another file or --overwrite to overwrite the input file.")
 
     logging.basicConfig(format="%(levelname)s: %(message)s", level=logging.DEBUG if args.verbose else logging.INFO)
+    if args.stats:
+        atexit.register(bibtex_dblp.stats.print_report, args.stats_format)
+    if args.profile or args.profile_dump:
+        profiler = bibtex_dblp.profiling.Profiler(cprofile=args.profile_dump is not None)
+        profiler.start()
+        atexit.register(profiler.finish, args.profile_dump)
 
     outfile = args.infile if args.out is None else args.out
 
-    bib = bibtex_dblp.database.load_from_file(args.infile)
+    bib = bibtex_dblp.database.load_from_file(args.infile, processes=args.processes or None)
+    if args.report_duplicates or args.merge_duplicates:
+        clusters = bibtex_dblp.dedup.find_duplicates(bib)
+        for cluster in clusters:
+            logging.info("Possible duplicates: {}".format(", ".join(cluster)))
+    if args.merge_duplicates:
+        bib, removed = bibtex_dblp.dedup.merge_duplicates(bib, clusters)
+        if removed:
+            logging.warning("Merged {} duplicate entries. Update the citations of the removed keys in the LaTeX sources.".format(len(removed)))
     # Apply modifications
     bib = bibtex_dblp.database.modify_entries(
         bib, remove_escapes=args.no_escape, remove_timestamp=args.no_timestamp, remove_biburl=args.no_biburl, remove_bibsource=args.no_bibsource
@@ -0,0 +1,78 @@
+#!/usr/bin/env python
+"""
+Process a stream of JSONL requests (searches, DBLP ids, bibtex entries) and write the results as JSONL.
+"""
+
+import argparse
+import atexit
+import logging
+import os
+import sys
+from pathlib import Path
+
+import bibtex_dblp.profiling
+import bibtex_dblp.stats
+import bibtex_dblp.stream
+from bibtex_dblp.dblp_api import BibFormat, DblpSession
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Search DBLP and fetch bibtex for a stream of JSONL requests.")
+
+    parser.add_argument("--input", "-i", help="Input JSONL file. If no input file is given, the requests are read from stdin.", type=Path, default=None)
+    parser.add_argument("--output", "-o", help="Output JSONL file. If no output file is given, the results are written to stdout.", type=Path, default=None)
+    parser.add_argument("--format", "-f", help="DBLP format type to convert into", type=BibFormat, choices=list(BibFormat), default=BibFormat.condensed)
+    parser.add_argument("--max-results", help="Maximal number of search results per query.", type=int, default=30)
+    parser.add_argument("--sleep-time", "-t", help="Sleep time (in seconds) between requests. Can prevent errors with too many requests)", type=int, default=5)
+    parser.add_argument("--cache", help="Directory for storing fetched DBLP records locally", type=Path, default=None)
+    parser.add_argument("--refresh", help="Revalidate cached DBLP records with conditional requests", action="store_true")
+    parser.add_argument("--workers", help="Number of concurrent requests.", type=int, default=4)
+    parser.add_argument("--window", help="Maximal number of requests in progress (default: twice the number of workers).", type=int, default=None)
+    parser.add_argument("--ordered", help="Write results in the order of the requests instead of as soon as they are finished", action="store_true")
+    parser.add_argument("--stats", help="Print runtime statistics at the end", action="store_true")
+    parser.add_argument("--stats-format", help="Format of the runtime statistics", choices=["text", "json"], default="text")
+    parser.add_argument("--profile", help="Print wall time, CPU time and peak memory per phase at the end", action="store_true")
+    parser.add_argument("--profile-dump", help="Write cProfile statistics in pstats format to the given file", type=Path, default=None)
+
+    parser.add_argument("--verbose", "-v", help="print more output", action="store_true")
+    args = parser.parse_args()
+
+    # Logging goes to stderr and does not interfere with the results
+    logging.basicConfig(format="%(levelname)s: %(message)s", level=logging.DEBUG if args.verbose else logging.INFO)
+    if args.stats:
+        atexit.register(bibtex_dblp.stats.print_report, args.stats_format)
+    if args.profile or args.profile_dump:
+        profiler = bibtex_dblp.profiling.Profiler(cprofile=args.profile_dump is not None)
+        profiler.start()
+        atexit.register(profiler.finish, args.profile_dump)
+
+    session = DblpSession(wait_time=args.sleep_time, cache_dir=args.cache, revalidate=args.refresh)
+    infile = sys.stdin if args.input is None else open(args.input, encoding="utf-8")
+    outfile = sys.stdout if args.output is None else open(args.output, "w", encoding="utf-8")
+    try:
+        no_results, no_errors = bibtex_dblp.stream.stream_requests(
+            session,
+            infile,
+            outfile,
+            bib_format=args.format,
+            max_search_results=args.max_results,
+            workers=args.workers,
+            window=args.window,
+            ordered=args.ordered,
+        )
+        logging.info("Processed {} requests ({} failed)".format(no_results, no_errors))
+    except BrokenPipeError:
+        # Consumer stopped reading (e.g. 'head') -> stop quietly
+        devnull = os.open(os.devnull, os.O_WRONLY)
+        os.dup2(devnull, sys.stdout.fileno())
+    except KeyboardInterrupt:
+        logging.info("Stopped")
+    finally:
+        if args.input is not None:
+            infile.close()
+        if args.output is not None:
+            outfile.close()
+
+
+if __name__ == "__main__":
+    main()
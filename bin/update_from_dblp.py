@@ -4,6 +4,7 @@ Import entry from DBLP according to given search input.
 """
 
 import argparse
+import atexit
 import logging
 import requests
 from copy import deepcopy
@@ -11,8 +12,12 @@ from pathlib import Path
 
 import bibtex_dblp.database
 import bibtex_dblp.dblp_api
+import bibtex_dblp.dedup
 import bibtex_dblp.io
-from bibtex_dblp.dblp_api import BibFormat, DblpSession
+import bibtex_dblp.planner
+import bibtex_dblp.profiling
+import bibtex_dblp.stats
+from bibtex_dblp.dblp_api import BibFormat, DblpSession, RequestBudget
 
 
 def search_entry(session, search_string, max_search_results, include_arxiv):
@@ -48,13 +53,36 @@ def main():
     parser.add_argument("--format", "-f", help="DBLP format type to convert into", type=BibFormat, choices=list(BibFormat), default=BibFormat.condensed)
     parser.add_argument("--max-results", help="Maximal number of search results to display.", type=int, default=30)
     parser.add_argument("--disable-auto", help="Disable automatic selection of publications.", action="store_true")
+    parser.add_argument("--disable-doi", help="Disable the exact lookup of entries by their DOI.", action="store_true")
     parser.add_argument("--include-arxiv", help="Include entries from arXiv in search results.", action="store_true")
     parser.add_argument("--sleep-time", "-t", help="Sleep time (in seconds) between requests. Can prevent errors with too many requests)", type=int, default=5)
+    parser.add_argument("--cache", help="Directory for storing fetched DBLP records locally", type=Path, default=None)
+    parser.add_argument("--refresh", help="Revalidate cached DBLP records with conditional requests", action="store_true")
+    parser.add_argument("--plan", help="Only print the expected number of requests and time without updating", action="store_true")
+    parser.add_argument("--max-requests", help="Maximal number of requests to DBLP. Stops the update afterwards.", type=int, default=None)
+    parser.add_argument("--time-budget", help="Maximal time (in seconds) for requests to DBLP. Stops the update afterwards.", type=float, default=None)
+    parser.add_argument("--processes", "-j", help="Number of processes used for parsing the bibtex file (0 uses all CPUs).", type=int, default=1)
+    parser.add_argument("--merge-duplicates", help="Merge near-duplicate entries (same authors and title) before processing.", action="store_true")
+    parser.add_argument(
+        "--overwrite", help="Allow overwriting the input file with --merge-duplicates (citations of removed keys must be updated)", action="store_true"
+    )
+    parser.add_argument("--stats", help="Print runtime statistics at the end", action="store_true")
+    parser.add_argument("--stats-format", help="Format of the runtime statistics", choices=["text", "json"], default="text")
+    parser.add_argument("--profile", help="Print wall time, CPU time and peak memory per phase at the end", action="store_true")
+    parser.add_argument("--profile-dump", help="Write cProfile statistics in pstats format to the given file", type=Path, default=None)
     parser.add_argument("--verbose", "-v", help="Print more output", action="store_true")
 
     args = parser.parse_args()
+    if args.merge_duplicates and args.out is None and not args.overwrite:
+        parser.error("--merge-duplicates removes cite keys. Use --out to write to another file or --overwrite to overwrite the input file.")
 
     logging.basicConfig(format="%(levelname)s: %(message)s", level=logging.DEBUG if args.verbose else logging.INFO)
+    if args.stats:
+        atexit.register(bibtex_dblp.stats.print_report, args.stats_format)
+    if args.profile or args.profile_dump:
+        profiler = bibtex_dblp.profiling.Profiler(cprofile=args.profile_dump is not None)
+        profiler.start()
+        atexit.register(profiler.finish, args.profile_dump)
     outfile = args.infile if args.out is None else args.out
     bib_format = args.format
     max_search_results = args.max_results
@@ -62,77 +90,121 @@ def main():
     include_arxiv = args.include_arxiv
 
     # Load bibliography
-    bib = bibtex_dblp.database.load_from_file(args.infile)
+    bib = bibtex_dblp.database.load_from_file(args.infile, processes=args.processes or None)
+    if args.merge_duplicates:
+        clusters = bibtex_dblp.dedup.find_duplicates(bib)
+        bib, removed = bibtex_dblp.dedup.merge_duplicates(bib, clusters)
+        if removed:
+            logging.warning("Merged {} duplicate entries. Update the citations of the removed keys in the LaTeX sources.".format(len(removed)))
     new_entries = deepcopy(bib.entries)
     # Iterate over all entries
     missing_entries = []
-    session = DblpSession(wait_time=args.sleep_time)
-    for entry_str, entry in bib.entries.items():
+    budget = None
+    if args.max_requests is not None or args.time_budget is not None:
+        budget = RequestBudget(max_requests=args.max_requests, time_budget=args.time_budget)
+    session = DblpSession(wait_time=args.sleep_time, cache_dir=args.cache, revalidate=args.refresh, budget=budget)
+    if args.plan:
+        print(bibtex_dblp.planner.plan_update(session, bib, bib_format=bib_format, use_doi=not args.disable_doi))
+        return
+
+    # Resolve entries with DOI by exact lookup before using the fuzzy search
+    doi_keys = dict()
+    if not args.disable_doi:
+        dois = dict()
+        for entry_str, entry in bib.entries.items():
+            if bibtex_dblp.dblp_api.extract_dblp_id(entry) is None and "doi" in entry.fields:
+                dois[entry_str] = bibtex_dblp.dblp_api.normalize_doi(entry.fields["doi"])
+        with bibtex_dblp.profiling.phase("resolve_ids"):
+            resolved = bibtex_dblp.dblp_api.resolve_dois(session, dois.values())
+        doi_keys = {entry_str: resolved[doi] for entry_str, doi in dois.items() if doi in resolved}
+        logging.info("Resolved {} of {} entries with DOI".format(len(doi_keys), len(dois)))
+
+    entries = list(bib.entries.items())
+    if budget is not None:
+        # Entries resolved by DOI need no search and are updated first
+        entries.sort(key=lambda item: item[0] not in doi_keys)
+    for entry_str, entry in entries:
         # Check for id
         dblp_id = bibtex_dblp.dblp_api.extract_dblp_id(entry)
         if dblp_id is not None:
             continue
 
-        if "author" in entry.persons:
-            authors = ", ".join([str(author) for author in entry.persons["author"]])
-            # Clean-up search string
-            authors = authors.replace("{", "")
-            authors = authors.replace("}", "")
+        if entry_str in doi_keys:
+            # Entry was already resolved by its DOI
+            dblp_key = doi_keys[entry_str]
         else:
-            authors = ""
-        if "title" in entry.fields:
-            title = entry.fields["title"]
-            # Clean-up search string
-            title = title.replace("{", "")
-            title = title.replace("}", "")
-        else:
-            title = ""
+            if "author" in entry.persons:
+                authors = ", ".join([str(author) for author in entry.persons["author"]])
+                # Clean-up search string
+                authors = authors.replace("{", "")
+                authors = authors.replace("}", "")
+            else:
+                authors = ""
+            if "title" in entry.fields:
+                title = entry.fields["title"]
+                # Clean-up search string
+                title = title.replace("{", "")
+                title = title.replace("}", "")
+            else:
+                title = ""
+
+            search_string = "{} {}".format(authors, title)
+            try:
+                with bibtex_dblp.profiling.phase("resolve_ids"):
+                    search_results, total_matches = search_entry(session, search_string, max_search_results, include_arxiv)
+                    if total_matches == 0:
+                        # Try once again with only the title
+                        search_results, total_matches = search_entry(session, title, max_search_results, include_arxiv)
+            except requests.exceptions.HTTPError as err:
+                logging.warning("Search request returned error {}. Skipped this entry.".format(err))
+                missing_entries.append(search_string)
+                continue
+            except bibtex_dblp.dblp_api.BudgetExhaustedException as err:
+                logging.warning(str(err) + ". Stopping the update.")
+                break
 
-        search_string = "{} {}".format(authors, title)
-        try:
-            search_results, total_matches = search_entry(session, search_string, max_search_results, include_arxiv)
             if total_matches == 0:
-                # Try once again with only the title
-                search_results, total_matches = search_entry(session, title, max_search_results, include_arxiv)
-        except requests.exceptions.HTTPError as err:
-            logging.warning("Search request returned error {}. Skipped this entry.".format(err))
-            missing_entries.append(search_string)
-            continue
-
-        if total_matches == 0:
-            # No luck -> try next entry
-            logging.debug("The search returned no matches.")
-            missing_entries.append(search_string)
-            continue
-
-        if auto_mode and len(search_results) == 1:
-            # Select single publication
-            publication = search_results[0].publication
-            logging.debug("The search returned a single match.")
-        else:
-            assert len(search_results) > 1
-            # Let user select correct publication
-            print("The search returned {} matches:".format(total_matches))
-            if total_matches > max_search_results:
-                print("Displaying only the first {} matches.".format(max_search_results))
-            for i in range(len(search_results)):
-                result = search_results[i]
-                print("({})\t{}".format(i + 1, result.publication))
-            # Let user select
-            select = bibtex_dblp.io.get_user_number("Select the intended publication (0 to abort): ", 0, total_matches)
-
-            if select == 0:
+                # No luck -> try next entry
+                logging.debug("The search returned no matches.")
                 missing_entries.append(search_string)
                 continue
-            publication = search_results[select - 1].publication
 
-        result_dblp = bibtex_dblp.dblp_api.get_bibtex(session, publication.key, bib_format=bib_format)
-        data = bibtex_dblp.database.parse_bibtex(result_dblp)
+            if auto_mode and len(search_results) == 1:
+                # Select single publication
+                publication = search_results[0].publication
+                logging.debug("The search returned a single match.")
+            else:
+                assert len(search_results) > 1
+                # Let user select correct publication
+                print("The search returned {} matches:".format(total_matches))
+                if total_matches > max_search_results:
+                    print("Displaying only the first {} matches.".format(max_search_results))
+                for i in range(len(search_results)):
+                    result = search_results[i]
+                    print("({})\t{}".format(i + 1, result.publication))
+                # Let user select
+                select = bibtex_dblp.io.get_user_number("Select the intended publication (0 to abort): ", 0, total_matches)
+
+                if select == 0:
+                    missing_entries.append(search_string)
+                    continue
+                publication = search_results[select - 1].publication
+            dblp_key = publication.key
+
+        try:
+            with bibtex_dblp.profiling.phase("fetch"):
+                result_dblp = bibtex_dblp.dblp_api.get_bibtex(session, dblp_key, bib_format=bib_format)
+        except bibtex_dblp.dblp_api.BudgetExhaustedException as err:
+            logging.warning(str(err) + ". Stopping the update.")
+            break
+        with bibtex_dblp.profiling.phase("parse"):
+            data = bibtex_dblp.database.parse_bibtex(result_dblp)
         assert len(data.entries) == 1
 
         # Update entries
-        key = next(iter(data.entries))
-        new_entries[entry_str] = data.entries[key]
+        with bibtex_dblp.profiling.phase("merge"):
+            key = next(iter(data.entries))
+            new_entries[entry_str] = data.entries[key]
         logging.debug("Updated entry for '{}'".format(data.entries))
 
     # Set new entries
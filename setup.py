@@ -6,5 +6,6 @@ setup(
         "bin/import_dblp.py",
         "bin/convert_dblp.py",
         "bin/update_from_dblp.py",
+        "bin/stream_dblp.py",
     ],
 )
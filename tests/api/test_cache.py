@@ -0,0 +1,37 @@
+import pytest
+
+import bibtex_dblp.dblp_api
+from bibtex_dblp.dblp_api import BibFormat, DblpSession
+
+BIBTEX = """@inproceedings{DBLP:conf/spire/BastMW06,
+  author       = {Holger Bast and
+                  Christian Worm Mortensen and
+                  Ingmar Weber},
+  title        = {Output-Sensitive Autocompletion Search},
+  booktitle    = {{SPIRE}},
+  year         = {2006}
+}
+
+"""
+
+
+def test_cache(fake_dblp, tmp_path):
+    fake_dblp.add_record("conf/spire/BastMW06", BIBTEX)
+    session = DblpSession(wait_time=0.01, dblp_base_url=fake_dblp.url, cache_dir=tmp_path)
+    bibtex = bibtex_dblp.dblp_api.get_bibtex(session, "conf/spire/BastMW06", bib_format=BibFormat.standard)
+    assert "Output-Sensitive Autocompletion Search" in bibtex
+    assert fake_dblp.request_count() == 1
+
+    # Cached record is used without request
+    assert bibtex_dblp.dblp_api.get_bibtex(session, "conf/spire/BastMW06", bib_format=BibFormat.standard) == bibtex
+    assert fake_dblp.request_count() == 1
+
+    # Revalidation sends conditional request
+    session = DblpSession(wait_time=0.01, dblp_base_url=fake_dblp.url, cache_dir=tmp_path, revalidate=True)
+    assert bibtex_dblp.dblp_api.get_bibtex(session, "conf/spire/BastMW06", bib_format=BibFormat.standard) == bibtex
+    path, headers = fake_dblp.requests[-1]
+    assert path == "/rec/conf/spire/BastMW06.bib?param=1"
+    assert headers["If-None-Match"] == '"conf/spire/BastMW06-1"'
+
+    with pytest.raises(bibtex_dblp.dblp_api.InvalidDblpIdException):
+        bibtex_dblp.dblp_api.get_bibtex(session, "conf/spire/Invalid", bib_format=BibFormat.standard)
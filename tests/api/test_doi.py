@@ -0,0 +1,30 @@
+import bibtex_dblp.dblp_api
+from bibtex_dblp.dblp_api import BibFormat, DblpSession
+
+
+def test_normalize_doi():
+    assert bibtex_dblp.dblp_api.normalize_doi("https://doi.org/10.1007/11880561\\_13") == "10.1007/11880561_13"
+    assert bibtex_dblp.dblp_api.normalize_doi(" doi:10.1007/S10791-008-9048-X") == "10.1007/s10791-008-9048-x"
+
+
+def test_resolve_dois(fake_dblp, tmp_path):
+    fake_dblp.add_publication("conf/spire/BastMW06", "Output-Sensitive Autocompletion Search.", ["Holger Bast"], doi="10.1007/11880561_13")
+    fake_dblp.add_publication("journals/ir/BastMW08", "Output-sensitive autocompletion search.", ["Holger Bast"], doi="10.1007/S10791-008-9048-X")
+    fake_dblp.add_publication("journals/pvldb/Ley09", "DBLP - Some Lessons Learned.", ["Michael Ley"], doi="10.14778/1687553.1687577")
+    fake_dblp.add_record("journals/pvldb/Ley09", "@article{DBLP:journals/pvldb/Ley09,\n  doi = {10.14778/1687553.1687577},\n}\n\n", "1")
+
+    session = DblpSession(wait_time=0.01, dblp_base_url=fake_dblp.url, cache_dir=tmp_path)
+    bibtex_dblp.dblp_api.get_bibtex(session, "journals/pvldb/Ley09", bib_format=BibFormat.standard)
+    assert bibtex_dblp.dblp_api.cached_doi_index(session) == {"10.14778/1687553.1687577": "journals/pvldb/Ley09"}
+
+    requests_before = fake_dblp.request_count()
+    dois = ["10.1007/11880561\\_13", "https://doi.org/10.1007/s10791-008-9048-x", "10.14778/1687553.1687577", "10.1000/unknown"]
+    resolved = bibtex_dblp.dblp_api.resolve_dois(session, dois, batch_size=10)
+    assert resolved == {
+        "10.1007/11880561_13": "conf/spire/BastMW06",
+        "10.1007/s10791-008-9048-x": "journals/ir/BastMW08",
+        "10.14778/1687553.1687577": "journals/pvldb/Ley09",
+    }
+    # Single batched search request, cached DOI is not searched
+    assert fake_dblp.request_count() == requests_before + 1
+    assert "1687553" not in fake_dblp.requests[-1][0]
@@ -0,0 +1,78 @@
+from conftest import bib_path
+
+import io
+
+import bibtex_dblp.batch
+import bibtex_dblp.database
+from bibtex_dblp.batch import BatchResult
+from bibtex_dblp.dblp_api import BibFormat, DblpSession
+
+
+def test_read_queries():
+    lines = "# Comment\nOutput-sensitive autocompletion search\n\n10.1007/11880561_13\n"
+    assert bibtex_dblp.batch.read_queries(io.StringIO(lines)) == ["Output-sensitive autocompletion search", "10.1007/11880561_13"]
+    csv = 'id,title\n1,"Storm, a model checker"\n2,Lessons learned\n'
+    assert bibtex_dblp.batch.read_queries(io.StringIO(csv), "csv") == ["Storm, a model checker", "Lessons learned"]
+    jsonl = '{"query": "Storm"}\n{"doi": "10.1007/11880561_13"}\n'
+    assert bibtex_dblp.batch.read_queries(io.StringIO(jsonl), "jsonl") == ["Storm", "10.1007/11880561_13"]
+
+
+def test_import_queries(fake_dblp, fake_session):
+    fake_dblp.add_publication("conf/spire/BastMW06", "Output-Sensitive Autocompletion Search.", ["Holger Bast", "Ingmar Weber"], doi="10.1007/11880561_13")
+    fake_dblp.add_publication(
+        "journals/ir/BastMW08", "Output-sensitive autocompletion search.", ["Holger Bast", "Ingmar Weber"], doi="10.1007/S10791-008-9048-X"
+    )
+    fake_dblp.add_publication("journals/pvldb/Ley09", "DBLP - Some Lessons Learned.", ["Michael Ley"])
+    fake_dblp.add_publication("conf/other/Lessons", "Lessons from the past.", ["Somebody Else"])
+    fake_dblp.add_record("conf/spire/BastMW06", "@inproceedings{DBLP:conf/spire/BastMW06,\n  title = {Output-Sensitive Autocompletion Search}\n}\n\n", "0")
+
+    bib = bibtex_dblp.database.load_from_file(bib_path("ley.bib"))
+    queries = ["10.1007/11880561_13", "Output-sensitive autocompletion search", "Lessons", "Ley lessons learned", "Nothing to find", "Some Lessons Learned"]
+    results = bibtex_dblp.batch.import_queries(fake_session, queries, bib=bib, bib_format=BibFormat.condensed)
+    assert [result.status for result in results] == [
+        BatchResult.IMPORTED,
+        BatchResult.AMBIGUOUS,
+        BatchResult.AMBIGUOUS,
+        BatchResult.PRESENT,
+        BatchResult.NOT_FOUND,
+        BatchResult.PRESENT,
+    ]
+    assert "DBLP:conf/spire/BastMW06" in results[0].bibtex
+    assert len(results[1].candidates) == 2
+
+
+def test_import_failed_fetch(fake_dblp, fake_session):
+    # No bibtex record -> fetching fails
+    fake_dblp.add_publication("journals/pvldb/Ley09", "DBLP - Some Lessons Learned.", ["Michael Ley"])
+    queries = ["Some Lessons Learned", "DBLP some lessons learned"]
+    results = bibtex_dblp.batch.import_queries(fake_session, queries, bib_format=BibFormat.condensed, workers=1)
+    # The failed publication is not reported as present for the second query
+    assert [result.status for result in results] == [BatchResult.ERROR, BatchResult.ERROR]
+
+
+def test_import_present_without_dblp_id(fake_dblp, fake_session):
+    fake_dblp.add_publication("conf/spire/BastMW06", "Output-Sensitive Autocompletion Search.", ["Holger Bast", "Ingmar Weber"], doi="10.1007/11880561_13")
+    fake_dblp.add_publication("journals/pvldb/Ley09", "DBLP - Some Lessons Learned.", ["Michael Ley"])
+    # Existing entries without DBLP id
+    bib = bibtex_dblp.database.parse_bibtex("""
+        @inproceedings{bast2006,
+          title = {Some other title},
+          doi   = {10.1007/11880561\\_13}
+        }
+        @article{ley2009,
+          title = {{DBLP} -- some lessons learned}
+        }
+        """)
+    queries = ["Bast Weber autocompletion", "Ley lessons learned", "https://doi.org/10.1007/11880561_13"]
+    results = bibtex_dblp.batch.import_queries(fake_session, queries, bib=bib, bib_format=BibFormat.condensed)
+    assert [result.status for result in results] == [BatchResult.PRESENT, BatchResult.PRESENT, BatchResult.PRESENT]
+    # The DOI query is recognized without any request
+    assert len(fake_dblp.requests) == 2
+
+
+def test_import_failing_host():
+    # Nothing listens on port 1
+    session = DblpSession(wait_time=0.01, dblp_base_url="http://127.0.0.1:1")
+    results = bibtex_dblp.batch.import_queries(session, ["Output-sensitive autocompletion search", "Lessons learned"], bib_format=BibFormat.condensed)
+    assert [result.status for result in results] == [BatchResult.ERROR, BatchResult.ERROR]
+    assert all("failed" in result.message for result in results)
@@ -1,5 +1,9 @@
+import json
 import os
 import pytest
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
 
 from bibtex_dblp.dblp_api import DblpSession
 
@@ -11,3 +15,136 @@ def dblp_session():
 
 def bib_path(*paths):
     return os.path.join(os.path.dirname(__file__), "files", *paths)
+
+
+# DBLP keys for generated records
+KEYS = ["conf/spire/BastMW06", "conf/sigir/BastW06", "conf/cikm/BastMW07"]
+
+
+def record_bibtex(key, title=None, year=2006, doi=False):
+    """
+    Generate bibtex of a DBLP record.
+    The title is 'Title of <key>' unless given. With doi=True, the record contains the DOI '10.1007/<key>'.
+    """
+    lines = ["@inproceedings{{DBLP:{},".format(key), "  author       = {Holger Bast},", "  title        = {{{}}},".format(title or "Title of " + key)]
+    if doi:
+        lines.append("  doi          = {{10.1007/{}}},".format(key))
+    lines.append("  year         = {{{}}}".format(year))
+    return "\n".join(lines) + "\n}\n\n"
+
+
+class FakeDblp:
+    """
+    Local HTTP server imitating the DBLP API for tests without network access.
+    """
+
+    def __init__(self):
+        # Map from DBLP key to bibtex (per format parameter)
+        self.records = dict()
+        # Map from DBLP key to search result info
+        self.publications = dict()
+        # Map from table of contents to DBLP keys
+        self.tocs = dict()
+        self.requests = []
+        fake = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                fake.requests.append((self.path, dict(self.headers)))
+                url = urlparse(self.path)
+                params = parse_qs(url.query)
+                if url.path == "/search/publ/api" and params.get("format", ["json"])[0].startswith("bib"):
+                    self.send_content(fake.toc_bibtex(params["q"][0], params["format"][0][len("bib") :]), etag=None)
+                elif url.path == "/search/publ/api":
+                    self.send_content(json.dumps(fake.search(params["q"][0], int(params.get("h", [30])[0]))), etag=None)
+                elif url.path.startswith("/rec/") and url.path.endswith(".bib"):
+                    key = url.path[len("/rec/") : -len(".bib")]
+                    param = params.get("param", ["1"])[0]
+                    if (key, param) not in fake.records:
+                        self.send_response(404)
+                        self.end_headers()
+                        return
+                    etag = '"{}-{}"'.format(key, param)
+                    if self.headers.get("If-None-Match") == etag:
+                        self.send_response(304)
+                        self.end_headers()
+                        return
+                    self.send_content(fake.records[(key, param)], etag=etag)
+                elif url.path.startswith("/rec/") and url.path.endswith(".xml"):
+                    key = url.path[len("/rec/") : -len(".xml")]
+                    toc = next((toc for toc, keys in fake.tocs.items() if key in keys), None)
+                    if toc is None:
+                        self.send_response(404)
+                        self.end_headers()
+                        return
+                    self.send_content('<dblp><inproceedings key="{}"><url>{}.html#{}</url></inproceedings></dblp>'.format(key, toc, key), etag=None)
+                else:
+                    self.send_response(404)
+                    self.end_headers()
+
+            def send_content(self, content, etag):
+                data = content.encode("utf-8")
+                self.send_response(200)
+                if etag is not None:
+                    self.send_header("ETag", etag)
+                self.send_header("Content-Length", str(len(data)))
+                self.end_headers()
+                self.wfile.write(data)
+
+            def log_message(self, format, *args):
+                pass
+
+        self.server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        self.url = "http://127.0.0.1:{}".format(self.server.server_address[1])
+
+    def add_record(self, key, bibtex, param="1"):
+        self.records[(key, param)] = bibtex
+
+    def add_records(self, keys, param="1", **kwargs):
+        # Generated records (see record_bibtex)
+        for key in keys:
+            self.add_record(key, record_bibtex(key, **kwargs), param)
+
+    def add_publication(self, key, title, authors, year=2020, doi=None, venue=None):
+        info = dict(title=title, year=str(year), key=key, venue=venue, authors=dict(author=[dict(text=author) for author in authors]))
+        if doi is not None:
+            info["doi"] = doi
+        self.publications[key] = info
+
+    def add_toc(self, toc, keys):
+        self.tocs[toc] = keys
+
+    def toc_bibtex(self, query, param):
+        toc = query[len("toc:") : -len(".bht:")]
+        return "\n\n".join(self.records[(key, param)].strip() for key in self.tocs.get(toc, []) if (key, param) in self.records) + "\n"
+
+    def search(self, query, max_results):
+        # Alternatives separated by '|' are combined by boolean OR
+        alternatives = [alternative.lower().split() for alternative in query.split("|")]
+        hits = [
+            info
+            for info in self.publications.values()
+            if any(all(any(word in str(value).lower() for value in info.values()) for word in words) for words in alternatives)
+        ]
+        result = dict(query=query, status={"@code": "200", "text": "OK"}, hits={"@total": str(len(hits))})
+        if hits:
+            result["hits"]["hit"] = [{"@score": "1", "info": info} for info in hits[:max_results]]
+        return dict(result=result)
+
+    def request_count(self):
+        return len(self.requests)
+
+
+@pytest.fixture
+def fake_dblp():
+    fake = FakeDblp()
+    thread = threading.Thread(target=fake.server.serve_forever, daemon=True)
+    thread.start()
+    yield fake
+    fake.server.shutdown()
+    fake.server.server_close()
+
+
+@pytest.fixture
+def fake_session(fake_dblp):
+    return DblpSession(wait_time=0.01, dblp_base_url=fake_dblp.url)
@@ -0,0 +1,68 @@
+from conftest import bib_path
+
+import bibtex_dblp.database
+import bibtex_dblp.dedup
+
+
+def test_find_duplicates():
+    bib = bibtex_dblp.database.load_from_file(bib_path("ley.bib"))
+    assert bibtex_dblp.dedup.find_duplicates(bib) == []
+
+    duplicates = bibtex_dblp.database.parse_bibtex("""
+        @article{ley2009,
+          author = {M. Ley},
+          title  = {DBLP -- some lessons learned.},
+          year   = {2009},
+        }
+        @inproceedings{michels,
+          author = {C. Michels and R. R. Fayzrakhmanov and M. Ley and E. Sallinger and R. Schenkel},
+          title  = {{OXPath}-based data acquisition for {DBLP}},
+        }
+        """)
+    for key, entry in duplicates.entries.items():
+        bib.add_entry(key, entry)
+
+    clusters = bibtex_dblp.dedup.find_duplicates(bib)
+    assert sorted(clusters) == [["DBLP:conf/jcdl/MichelsFLSS17", "michels"], ["DBLP:journals/pvldb/Ley09", "ley2009"]]
+
+    bib, removed = bibtex_dblp.dedup.merge_duplicates(bib, clusters)
+    assert removed == {"michels": "DBLP:conf/jcdl/MichelsFLSS17", "ley2009": "DBLP:journals/pvldb/Ley09"}
+    assert len(bib.entries) == 9
+
+
+def test_different_versions():
+    bib = bibtex_dblp.database.parse_bibtex("""
+        @inproceedings{DBLP:conf/spire/BastMW06,
+          author    = {Holger Bast and Christian Worm Mortensen and Ingmar Weber},
+          title     = {Output-Sensitive Autocompletion Search},
+          booktitle = {{SPIRE}},
+          year      = {2006}
+        }
+        @article{DBLP:journals/ir/BastMW08,
+          author    = {Holger Bast and Christian Worm Mortensen and Ingmar Weber},
+          title     = {Output-sensitive autocompletion search},
+          journal   = {Inf. Retr.},
+          year      = {2008}
+        }
+        @inproceedings{bast2006,
+          author    = {H. Bast and C. W. Mortensen and I. Weber},
+          title     = {Output-Sensitive Autocompletion Search},
+          year      = {2006}
+        }
+        @misc{preface2019,
+          author = {Holger Bast},
+          title  = {Preface},
+          year   = {2019}
+        }
+        @misc{preface2020,
+          author = {Holger Bast},
+          title  = {Preface},
+          year   = {2020}
+        }
+        """)
+    # The conference and the journal version are different publications
+    clusters = bibtex_dblp.dedup.find_duplicates(bib)
+    assert clusters == [["DBLP:conf/spire/BastMW06", "bast2006"]]
+    bib, removed = bibtex_dblp.dedup.merge_duplicates(bib, clusters)
+    assert removed == {"bast2006": "DBLP:conf/spire/BastMW06"}
+    assert "DBLP:journals/ir/BastMW08" in bib.entries
@@ -53,3 +53,38 @@ def test_modify_entries():
     assert count_entries(bib) == (2, 9, 9, 9)
     bib = bibtex_dblp.database.modify_entries(bib, remove_escapes=True, remove_timestamp=True, remove_biburl=True, remove_bibsource=True)
     assert count_entries(bib) == (0, 0, 0, 0)
+
+
+def test_split_bibtex():
+    text = """
+    Some comment with @ sign
+    @string{tacas = "TACAS"}
+    @comment{ignored text}
+    @article(key1, title = "With ) bracket", journal = tacas)
+    @misc{key2, title = {Nested {braces}}}
+    """
+    commands = bibtex_dblp.database.split_bibtex(text)
+    assert [command for command, _, _ in commands] == ["string", "article", "misc"]
+    assert text[commands[1][1] : commands[1][2]] == '@article(key1, title = "With ) bracket", journal = tacas)'
+    assert text[commands[2][1] : commands[2][2]] == "@misc{key2, title = {Nested {braces}}}"
+
+
+def test_load_parallel(tmp_path, monkeypatch):
+    """
+    Check that parsing in parallel yields the same result as sequential parsing
+    """
+    monkeypatch.setattr(bibtex_dblp.database, "MIN_CHUNK_COMMANDS", 2)
+    content = '@preamble{"first"}\n@string{venue = "TACAS"}\n'
+    for i in range(20):
+        content += "@inproceedings{{key{0}, title = {{Title {0}}}, booktitle = venue, year = 2020}}\n".format(i)
+        if i == 10:
+            content += '@preamble{"second"}\n@string{venue = "CAV"}\n'
+    bib_file = tmp_path / "parallel.bib"
+    bib_file.write_text(content, encoding="utf-8")
+
+    bib = bibtex_dblp.database.load_from_file(bib_file)
+    bib_parallel = bibtex_dblp.database.load_from_file(bib_file, processes=2)
+    assert list(bib_parallel.entries.keys()) == list(bib.entries.keys())
+    assert bib_parallel == bib
+    assert bib_parallel.preamble_list == ["first", "second"]
+    assert bib_parallel.entries["key15"].fields["booktitle"] == "CAV"
@@ -0,0 +1,55 @@
+from conftest import KEYS
+
+import json
+import pytest
+
+import bibtex_dblp.database
+import bibtex_dblp.dblp_api
+import bibtex_dblp.lock
+from bibtex_dblp.dblp_api import BibFormat, DblpSession
+from bibtex_dblp.lock import RecordLock
+
+
+def test_update_and_frozen_lock(fake_dblp, tmp_path):
+    fake_dblp.add_records(KEYS, param="1")
+    lock_file = tmp_path / "refs.bib.dblp-lock"
+    lock = RecordLock(lock_file, frozen=False)
+    session = DblpSession(wait_time=0.01, dblp_base_url=fake_dblp.url, lock=lock)
+    for key in KEYS:
+        bibtex_dblp.dblp_api.get_bibtex(session, key, bib_format=BibFormat.standard)
+    assert fake_dblp.request_count() == 3
+    assert lock.missing(KEYS + ["conf/other/Key"], BibFormat.standard) == ["conf/other/Key"]
+    lock.save()
+
+    # Conversion from frozen lockfile needs no requests
+    session = DblpSession(wait_time=0.01, dblp_base_url=fake_dblp.url, lock=RecordLock(lock_file))
+    bib = bibtex_dblp.database.parse_bibtex("".join("@inproceedings{{DBLP:{},\n  title = {{Old}}\n}}\n".format(key) for key in KEYS))
+    bib, no_changes = bibtex_dblp.database.convert_dblp_entries(session, bib, bib_format=BibFormat.standard)
+    assert no_changes == 3
+    assert bib.entries["DBLP:" + KEYS[0]].fields["title"] == "Title of " + KEYS[0]
+    assert fake_dblp.request_count() == 3
+    with pytest.raises(bibtex_dblp.lock.RecordNotLockedException):
+        bibtex_dblp.dblp_api.get_bibtex(session, KEYS[0], bib_format=BibFormat.condensed)
+
+    # Stale records are fetched again, locked ones are kept
+    lock = RecordLock(lock_file, frozen=False, max_age=0)
+    session = DblpSession(wait_time=0.01, dblp_base_url=fake_dblp.url, lock=lock)
+    bibtex_dblp.dblp_api.get_bibtex(session, KEYS[0], bib_format=BibFormat.standard)
+    assert fake_dblp.request_count() == 4
+    lock.prune([KEYS[0]])
+    lock.save()
+    data = json.loads(lock_file.read_text())
+    assert list(data["records"]) == [KEYS[0]]
+    assert len(data["objects"]) == 1
+
+
+def test_corrupted_lock(fake_dblp, tmp_path):
+    fake_dblp.add_records(KEYS[:1], param="1")
+    lock_file = tmp_path / "refs.bib.dblp-lock"
+    lock = RecordLock(lock_file, frozen=False)
+    session = DblpSession(wait_time=0.01, dblp_base_url=fake_dblp.url, lock=lock)
+    bibtex_dblp.dblp_api.get_bibtex(session, KEYS[0], bib_format=BibFormat.standard)
+    lock.save()
+    lock_file.write_text(lock_file.read_text().replace("Title of", "Changed title of"))
+    with pytest.raises(bibtex_dblp.lock.LockfileError):
+        RecordLock(lock_file)
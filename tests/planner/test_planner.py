@@ -0,0 +1,58 @@
+from conftest import KEYS
+
+import pybtex.database
+
+import bibtex_dblp.database
+import bibtex_dblp.dblp_api
+import bibtex_dblp.planner
+from bibtex_dblp.dblp_api import BibFormat, DblpSession, RequestBudget
+
+
+def bibliography():
+    bib = pybtex.database.BibliographyData()
+    for key in KEYS:
+        bib.add_entry("DBLP:" + key, pybtex.database.Entry("inproceedings", fields=dict(title="Old title", year="2006")))
+    bib.add_entry("Other", pybtex.database.Entry("article", fields=dict(title="Not on DBLP", year="2020")))
+    return bib
+
+
+def test_plan_conversion(fake_dblp, tmp_path):
+    fake_dblp.add_records(KEYS, param="0")
+    session = DblpSession(wait_time=2, dblp_base_url=fake_dblp.url, cache_dir=tmp_path)
+    plan = bibtex_dblp.planner.plan_conversion(session, bibliography(), BibFormat.condensed)
+    assert plan.entries == 3
+    assert plan.cache_hits == 0
+    assert plan.requests() == (3, 3)
+    assert plan.requests_per_format[BibFormat.condensed_doi] == (6, 6)
+    assert plan.estimated_time(3) == 0
+    assert plan.estimated_time(6) == 6
+    assert fake_dblp.request_count() == 0
+
+    # Cached records need no requests
+    bibtex_dblp.dblp_api.get_bibtex(session, KEYS[1], bib_format=BibFormat.condensed)
+    plan = bibtex_dblp.planner.plan_conversion(session, bibliography(), BibFormat.condensed)
+    assert plan.cache_hits == 1
+    assert plan.requests() == (2, 2)
+    assert bibtex_dblp.planner.prioritize_conversion(session, bibliography(), BibFormat.condensed) == ["DBLP:" + KEYS[1], "DBLP:" + KEYS[0], "DBLP:" + KEYS[2]]
+
+
+def test_plan_update(fake_session):
+    bib = bibliography()
+    bib.add_entry("Doi", pybtex.database.Entry("article", fields=dict(title="Some title", doi="10.1000/ABC")))
+    plan = bibtex_dblp.planner.plan_update(fake_session, bib, BibFormat.condensed)
+    assert plan.entries == 2
+    # One DOI search plus one fetch or (if the DOI is not found) one or two searches plus one fetch.
+    # One or two searches plus one fetch for the other entry.
+    assert plan.requests() == (2, 7)
+    plan = bibtex_dblp.planner.plan_update(fake_session, bib, BibFormat.condensed, use_doi=False)
+    assert plan.requests() == (2, 6)
+
+
+def test_budget(fake_dblp):
+    fake_dblp.add_records(KEYS, param="0")
+    session = DblpSession(wait_time=0.01, dblp_base_url=fake_dblp.url, budget=RequestBudget(max_requests=2))
+    bib, no_changes = bibtex_dblp.database.convert_dblp_entries(session, bibliography(), bib_format=BibFormat.condensed)
+    assert no_changes == 2
+    assert fake_dblp.request_count() == 2
+    assert bib.entries["DBLP:" + KEYS[0]].fields["title"] == "Title of " + KEYS[0]
+    assert bib.entries["DBLP:" + KEYS[2]].fields["title"] == "Old title"
@@ -0,0 +1,45 @@
+import pybtex.database
+
+import bibtex_dblp.database
+import bibtex_dblp.dblp_api
+import bibtex_dblp.prefetch
+from bibtex_dblp.dblp_api import BibFormat
+
+TOC = "db/conf/tacas/tacas2020-2"
+KEYS = ["conf/tacas/Paper{}20".format(i) for i in range(5)]
+
+
+def bibliography(keys):
+    bib = pybtex.database.BibliographyData()
+    for key in keys:
+        bib.add_entry("DBLP:" + key, pybtex.database.Entry("inproceedings", fields=dict(title="Old title", year="2020")))
+    return bib
+
+
+def test_prefetch_volumes(fake_dblp, fake_session):
+    fake_dblp.add_records(KEYS, param="0", year=2020)
+    fake_dblp.add_records(KEYS, param="1", year=2020, doi=True)
+    fake_dblp.add_toc(TOC, KEYS)
+    bib = bibliography(KEYS[:4] + ["conf/cav/Other20"])
+    prefetched = bibtex_dblp.prefetch.prefetch_volumes(fake_session, bib, bib_format=BibFormat.condensed_doi)
+    # One request to determine the volume and one per format
+    assert fake_dblp.request_count() == 3
+    assert sorted(prefetched) == KEYS[:4]
+    for key in KEYS[:4]:
+        assert prefetched[key] == bibtex_dblp.dblp_api.get_bibtex(fake_session, key, bib_format=BibFormat.condensed_doi)
+
+    fake_dblp.requests.clear()
+    fake_dblp.add_records(["conf/cav/Other20"], param="0", year=2020)
+    fake_dblp.add_records(["conf/cav/Other20"], param="1", year=2020, doi=True)
+    bib, no_changes = bibtex_dblp.database.convert_dblp_entries(fake_session, bib, bib_format=BibFormat.condensed_doi, prefetched=prefetched)
+    assert no_changes == 5
+    # Only the entry which was not prefetched is fetched separately
+    assert fake_dblp.request_count() == 2
+    assert bib.entries["DBLP:" + KEYS[0]].fields["doi"] == "10.1007/" + KEYS[0]
+
+
+def test_prefetch_small_groups(fake_dblp, fake_session):
+    fake_dblp.add_toc(TOC, KEYS)
+    bib = bibliography(KEYS[:3])
+    assert bibtex_dblp.prefetch.prefetch_volumes(fake_session, bib, bib_format=BibFormat.condensed) == dict()
+    assert fake_dblp.request_count() == 0
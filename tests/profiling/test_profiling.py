@@ -0,0 +1,32 @@
+from conftest import bib_path
+
+import bibtex_dblp.database
+import bibtex_dblp.profiling
+
+
+def test_profile(tmp_path):
+    with bibtex_dblp.profiling.profile(cprofile=True) as profiler:
+        bib = bibtex_dblp.database.load_from_file(bib_path("ley.bib"))
+        bib = bibtex_dblp.database.modify_entries(bib, remove_timestamp=True)
+        with bibtex_dblp.profiling.phase("custom"):
+            with bibtex_dblp.profiling.phase("custom_nested"):
+                data = [0] * 100000
+            del data
+        bibtex_dblp.database.write_to_file(bib, tmp_path / "export.bib")
+
+    assert list(profiler.phases.keys()) == ["load", "modify", "custom_nested", "custom", "write"]
+    for result in profiler.phases.values():
+        assert result.count == 1
+        assert result.wall_time >= 0
+        assert result.peak_memory > 0
+    # Peak memory of nested phase is included in enclosing phase
+    assert profiler.phases["custom"].peak_memory >= profiler.phases["custom_nested"].peak_memory >= 800000
+    assert profiler.wall_time >= sum(result.wall_time for result in profiler.phases.values() if result is not profiler.phases["custom_nested"])
+
+    profiler.dump_stats(tmp_path / "profile.pstats")
+    assert (tmp_path / "profile.pstats").exists()
+
+
+def test_phase_without_profiler():
+    with bibtex_dblp.profiling.phase("unused"):
+        pass
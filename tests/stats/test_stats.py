@@ -0,0 +1,36 @@
+from conftest import bib_path
+
+import json
+
+import bibtex_dblp.database
+import bibtex_dblp.stats
+
+
+def test_statistics():
+    statistics = bibtex_dblp.stats.Statistics()
+    statistics.increment("dblp.requests")
+    statistics.increment("dblp.requests")
+    statistics.increment("dblp.cache.hit", 3)
+    statistics.increment("dblp.cache.miss")
+    statistics.record_time("dblp.request", 0.05)
+    statistics.record_time("dblp.request", 3)
+
+    data = statistics.to_json()
+    assert data["counters"]["dblp.requests"] == 2
+    assert data["ratios"] == {"dblp.cache": 0.75}
+    timer = data["timers"]["dblp.request"]
+    assert timer["count"] == 2
+    assert timer["min"] == 0.05
+    assert timer["max"] == 3
+    assert timer["histogram"] == {"<=0.1": 1, "<=5": 1}
+    assert "dblp.cache hit ratio" in str(statistics)
+
+
+def test_global_statistics(tmp_path, capsys):
+    bibtex_dblp.stats.reset()
+    bib = bibtex_dblp.database.load_from_file(bib_path("ley.bib"))
+    bibtex_dblp.database.write_to_file(bib, tmp_path / "export.bib")
+    bibtex_dblp.stats.print_report("json")
+    data = json.loads(capsys.readouterr().err)
+    assert data["timers"]["bibtex.load"]["count"] == 1
+    assert data["timers"]["bibtex.write"]["count"] == 1
@@ -0,0 +1,113 @@
+import io
+import json
+
+import bibtex_dblp.database
+import bibtex_dblp.stream
+from bibtex_dblp.dblp_api import BibFormat, DblpSession, RequestBudget
+
+KEY = "conf/spire/BastMW06"
+BIBTEX = """@inproceedings{DBLP:conf/spire/BastMW06,
+  author       = {Holger Bast and
+                  Christian Worm Mortensen and
+                  Ingmar Weber},
+  title        = {Output-Sensitive Autocompletion Search},
+  booktitle    = {{SPIRE}},
+  year         = {2006}
+}
+
+"""
+
+
+def run(session, requests, **kwargs):
+    output = io.StringIO()
+    counts = bibtex_dblp.stream.stream_requests(session, io.StringIO("".join(line + "\n" for line in requests)), output, **kwargs)
+    return counts, [json.loads(line) for line in output.getvalue().splitlines()]
+
+
+def test_stream(fake_dblp, fake_session):
+    fake_dblp.add_publication(KEY, "Output-Sensitive Autocompletion Search.", ["Holger Bast", "Ingmar Weber"], year=2006, venue="SPIRE")
+    fake_dblp.add_record(KEY, BIBTEX, param="1")
+    requests = [
+        json.dumps(dict(id="a", query="autocompletion search")),
+        json.dumps(dict(id="b", dblp_id=KEY, format="standard")),
+        "",
+        json.dumps(dict(bibtex="@inproceedings{DBLP:" + KEY + ",\n title={Old}\n}")),
+        json.dumps(dict(bibtex="@article{Other,\n title={Not on DBLP}\n}")),
+        "not json",
+        json.dumps(dict(dblp_id="conf/spire/Invalid")),
+    ]
+    (no_results, no_errors), results = run(fake_session, requests, bib_format=BibFormat.standard, workers=2, window=2, ordered=True)
+    assert (no_results, no_errors) == (6, 2)
+    assert [result["line"] for result in results] == [1, 2, 4, 5, 6, 7]
+    assert results[0]["id"] == "a"
+    assert results[0]["total_matches"] == 1
+    assert results[0]["results"][0]["publication"]["key"] == KEY
+    assert results[0]["results"][0]["publication"]["authors"][1]["name"] == "Ingmar Weber"
+    assert results[1] == dict(line=2, id="b", dblp_id=KEY, bibtex=BIBTEX)
+    assert results[2]["dblp_id"] == KEY
+    assert bibtex_dblp.database.parse_bibtex(results[2]["bibtex"]).entries["DBLP:" + KEY].fields["title"] == "Output-Sensitive Autocompletion Search"
+    assert results[3]["dblp_id"] is None
+    assert "error" in results[4] and "error" in results[5]
+
+
+def test_stream_unordered(fake_dblp, fake_session):
+    fake_dblp.add_record(KEY, BIBTEX, param="0")
+    requests = [json.dumps(dict(id=i, dblp_id=KEY)) for i in range(10)]
+    (no_results, no_errors), results = run(fake_session, requests, workers=3, window=3)
+    assert (no_results, no_errors) == (10, 0)
+    assert sorted(result["id"] for result in results) == list(range(10))
+    assert all("biburl" in result["bibtex"] for result in results)
+
+
+def test_stream_keeps_key(fake_dblp, fake_session):
+    fake_dblp.add_record(KEY, BIBTEX, param="0")
+    requests = [json.dumps(dict(bibtex="@inproceedings{Bast06,\n biburl={https://dblp.org/rec/" + KEY + ".bib}\n}"))]
+    (no_results, no_errors), results = run(fake_session, requests)
+    assert (no_results, no_errors) == (1, 0)
+    assert results[0]["key"] == "Bast06" and results[0]["dblp_id"] == KEY
+    # Same result as convert_dblp: the cite key and the DBLP id are kept
+    bib = bibtex_dblp.database.parse_bibtex(results[0]["bibtex"])
+    assert list(bib.entries.keys()) == ["Bast06"]
+    assert bib.entries["Bast06"].fields["title"] == "Output-Sensitive Autocompletion Search"
+    assert bib.entries["Bast06"].fields["biburl"] == "https://dblp.org/rec/" + KEY + ".bib"
+
+
+def test_stream_invalid_types(fake_dblp, fake_session):
+    fake_dblp.add_record(KEY, BIBTEX, param="0")
+    requests = [
+        json.dumps(dict(query="x", max_results=None)),
+        json.dumps(dict(query=None)),
+        json.dumps(dict(dblp_id=["conf/spire/BastMW06"])),
+        json.dumps(dict(bibtex=42)),
+        json.dumps(dict(dblp_id=KEY, format=None)),
+        json.dumps(dict(query="x", max_results=0)),
+        json.dumps(dict(query="x", max_results="10")),
+        json.dumps(dict(id="valid", dblp_id=KEY)),
+    ]
+    # Invalid requests do not stop the stream
+    (no_results, no_errors), results = run(fake_session, requests, workers=2, ordered=True)
+    assert (no_results, no_errors) == (8, 7)
+    assert all("error" in result for result in results[:7])
+    assert results[7]["id"] == "valid" and results[7]["bibtex"].startswith("@inproceedings{DBLP:" + KEY)
+    assert fake_dblp.request_count() == 1
+
+
+def test_stream_failing_host(fake_dblp):
+    requests = [
+        json.dumps(dict(id="a", query="autocompletion search")),
+        json.dumps(dict(id="b", dblp_id=KEY)),
+        json.dumps(dict(id="c", bibtex="@article{Other,\n title={Not on DBLP}\n}")),
+    ]
+    # Nothing listens on port 1
+    session = DblpSession(wait_time=0.01, dblp_base_url="http://127.0.0.1:1")
+    (no_results, no_errors), results = run(session, requests, workers=2, ordered=True)
+    assert (no_results, no_errors) == (3, 2)
+    assert "error" in results[0] and "error" in results[1]
+    assert results[2]["dblp_id"] is None
+
+    # Exhausted budget only fails the affected requests
+    session = DblpSession(wait_time=0.01, dblp_base_url=fake_dblp.url, budget=RequestBudget(max_requests=0))
+    (no_results, no_errors), results = run(session, requests, workers=2, ordered=True)
+    assert (no_results, no_errors) == (3, 2)
+    assert "exhausted" in results[1]["error"]
+    assert results[2]["key"] == "Other"
@@ -0,0 +1,138 @@
+from conftest import KEYS, record_bibtex
+
+import time
+
+import bibtex_dblp.database
+import bibtex_dblp.watch
+from bibtex_dblp.dblp_api import BibFormat, RequestBudget
+
+
+def test_file_watcher(tmp_path):
+    path = tmp_path / "refs.bib"
+    watcher = bibtex_dblp.watch.FileWatcher([path])
+    assert not watcher.changed()
+    assert not watcher.wait(interval=0.01, timeout=0.05)
+    path.write_text(record_bibtex(KEYS[0]))
+    assert watcher.changed()
+    assert watcher.wait(interval=0.01)
+    watcher.snapshot()
+    assert not watcher.changed()
+
+
+def test_read_citations(tmp_path):
+    (tmp_path / "chapter.aux").write_text("\\relax\n\\citation{DBLP:conf/cikm/BastMW07}\n")
+    aux = tmp_path / "main.aux"
+    aux.write_text("\\relax\n\\citation{DBLP:conf/spire/BastMW06,Other}\n\\abx@aux@cite{0}{Biblatex}\n\\@input{chapter.aux}\n")
+    assert bibtex_dblp.watch.read_citations(aux) == {"DBLP:conf/spire/BastMW06", "Other", "Biblatex", "DBLP:conf/cikm/BastMW07"}
+    aux.write_text("\\relax\n\\citation{*}\n")
+    assert bibtex_dblp.watch.read_citations(aux) is None
+    assert bibtex_dblp.watch.read_citations(tmp_path / "missing.aux") == set()
+
+
+def test_incremental_conversion(fake_dblp, fake_session, tmp_path):
+    fake_dblp.add_records(KEYS, param="0")
+    infile = tmp_path / "refs.bib"
+    infile.write_text(record_bibtex(KEYS[0], "Old") + record_bibtex(KEYS[1], "Old") + "@article{Other,\n  title = {Not on DBLP}\n}\n")
+    converter = bibtex_dblp.watch.IncrementalConverter(fake_session, infile, infile, bib_format=BibFormat.condensed)
+    assert converter.update() == 2
+    assert fake_dblp.request_count() == 2
+    assert "Title of " + KEYS[0] in infile.read_text()
+
+    # Own write and unchanged input do not trigger conversions
+    assert not converter.watcher.changed()
+    assert converter.update() == 0
+    assert fake_dblp.request_count() == 2
+
+    # Only new and edited entries are converted
+    time.sleep(0.01)
+    content = infile.read_text().replace("Title of " + KEYS[1], "Edited")
+    infile.write_text(content + record_bibtex(KEYS[2], "New"))
+    assert converter.update() == 2
+    assert fake_dblp.request_count() == 4
+    bib = bibtex_dblp.database.load_from_file(infile)
+    assert list(bib.entries.keys()) == ["DBLP:" + KEYS[0], "DBLP:" + KEYS[1], "Other", "DBLP:" + KEYS[2]]
+    assert [entry.fields["title"] for entry in bib.entries.values()] == ["Title of " + KEYS[0], "Title of " + KEYS[1], "Not on DBLP", "Title of " + KEYS[2]]
+
+
+def test_edits_during_write(fake_dblp, fake_session, tmp_path, monkeypatch):
+    fake_dblp.add_records(KEYS, param="0")
+    infile = tmp_path / "refs.bib"
+    infile.write_text(record_bibtex(KEYS[0], "Old"))
+    converter = bibtex_dblp.watch.IncrementalConverter(fake_session, infile, infile)
+    write_to_file = bibtex_dblp.database.write_to_file
+
+    def append_entry(key):
+        time.sleep(0.01)
+        with open(infile, "a") as f:
+            f.write(record_bibtex(key, "New"))
+
+    # Edit before the file is replaced -> write is postponed
+    def edit_before_write(bib, outfile, check=None):
+        append_entry(KEYS[1])
+        return write_to_file(bib, outfile, check)
+
+    monkeypatch.setattr(bibtex_dblp.database, "write_to_file", edit_before_write)
+    assert converter.update() == 0
+    assert infile.read_text().endswith(record_bibtex(KEYS[1], "New"))
+
+    # Edit after the file is replaced -> edit is converted with the next update
+    def edit_after_write(bib, outfile, check=None):
+        written = write_to_file(bib, outfile, check)
+        append_entry(KEYS[2])
+        return written
+
+    monkeypatch.setattr(bibtex_dblp.database, "write_to_file", edit_after_write)
+    assert converter.update() == 2
+    assert converter.watcher.changed()
+    monkeypatch.setattr(bibtex_dblp.database, "write_to_file", write_to_file)
+    assert converter.update() == 1
+    assert [entry.fields["title"] for entry in bibtex_dblp.database.load_from_file(infile).entries.values()] == ["Title of " + key for key in KEYS]
+    assert not converter.watcher.changed()
+
+
+def test_exhausted_budget(fake_dblp, fake_session, tmp_path):
+    fake_dblp.add_records(KEYS, param="0")
+    infile = tmp_path / "refs.bib"
+    infile.write_text("".join(record_bibtex(key, "Old") for key in KEYS))
+    fake_session.budget = RequestBudget(max_requests=1)
+    converter = bibtex_dblp.watch.IncrementalConverter(fake_session, infile, infile)
+    assert converter.update() == 1
+    assert converter.converted == {"DBLP:" + KEYS[0]}
+
+    # Entries which were not reached are converted with the next update
+    fake_session.budget = None
+    time.sleep(0.01)
+    infile.write_text(infile.read_text() + "@article{Other,\n  title = {Not on DBLP}\n}\n")
+    assert converter.update() == 2
+    assert fake_dblp.request_count() == 3
+    assert [entry.fields["title"] for entry in bibtex_dblp.database.load_from_file(infile).entries.values()] == ["Title of " + key for key in KEYS] + [
+        "Not on DBLP"
+    ]
+
+
+def test_aux_restriction(fake_dblp, fake_session, tmp_path):
+    fake_dblp.add_records(KEYS, param="0")
+    infile = tmp_path / "refs.bib"
+    infile.write_text("".join(record_bibtex(key, "Old") for key in KEYS))
+    outfile = tmp_path / "out.bib"
+    aux = tmp_path / "main.aux"
+    aux.write_text("\\citation{DBLP:" + KEYS[1] + "}\n")
+    converter = bibtex_dblp.watch.IncrementalConverter(fake_session, infile, outfile, aux_file=aux)
+    assert converter.update() == 1
+    assert fake_dblp.request_count() == 1
+    assert [entry.fields["title"] for entry in bibtex_dblp.database.load_from_file(outfile).entries.values()] == ["Old", "Title of " + KEYS[1], "Old"]
+
+    # Newly cited entries are converted
+    aux.write_text("\\citation{DBLP:" + KEYS[1] + "}\n\\citation{DBLP:" + KEYS[2] + "}\n")
+    assert converter.update() == 1
+    assert fake_dblp.request_count() == 2
+
+
+def test_watch_survives_errors(fake_dblp, fake_session, tmp_path, monkeypatch):
+    infile = tmp_path / "refs.bib"
+    infile.write_text(record_bibtex(KEYS[0], "Old"))
+    converter = bibtex_dblp.watch.IncrementalConverter(fake_session, infile, infile)
+    # Unexpected record of DBLP
+    fake_dblp.add_record(KEYS[0], record_bibtex(KEYS[0]) + record_bibtex(KEYS[1]), param="0")
+    converter.watch(interval=0.01, max_updates=0)
+    assert "Old" in infile.read_text()